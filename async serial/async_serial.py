@@ -1,12 +1,68 @@
 import asyncio
+import os
+import threading
+import time
 from functools import partial
 import contextlib
-from concurrent.futures import ThreadPoolExecutor
-from serial import serial_for_url,Serial
-from typing import Optional,Union,Literal,AsyncGenerator
+from concurrent.futures import Future,ThreadPoolExecutor
+from serial import serial_for_url,Serial,SerialException,SerialTimeoutException,PortNotOpenError
+from typing import Any,Callable,Optional,Tuple,Union,Literal,AsyncGenerator
 
 
 Timeoutproperties=Union[Literal['write_timeout'],Literal['timeout']]
+# "executor" runs every blocking pyserial call in a worker thread.
+# "native" drives the tty fd from the event loop's selector (POSIX only).
+# "auto" picks native for tty paths on POSIX and the executor otherwise.
+TransportMode=Literal['auto','executor','native']
+
+
+def supports_native(serial:Serial)->bool:
+    return os.name=='posix' and callable(getattr(serial,'fileno',None))
+
+
+class SharedExecutor:
+    """Worker threads shared by every executor-mode serialAsync.
+
+    Each port holds a reference while it is open. A blocking read keeps its
+    thread until the port's timeout, so the pool always allows one thread
+    per open port and no port waits behind the others' reads; threads are
+    only started when calls actually overlap. The pool is shut down when the
+    last port is released. Ordering per port is kept by serialAsync itself.
+    """
+
+    def __init__(self)->None:
+        self._pool:Optional[ThreadPoolExecutor]=None
+        self._size=0
+        self._users=0
+        self._lock=threading.Lock()
+
+    def acquire(self)->None:
+        with self._lock:
+            self._users+=1
+            if self._users>self._size:
+                # Calls already running on the old pool finish there.
+                if self._pool is not None:
+                    self._pool.shutdown(wait=False)
+                self._size=max(self._users,2*self._size)
+                self._pool=ThreadPoolExecutor(max_workers=self._size,thread_name_prefix='serial-io')
+
+    def release(self)->None:
+        with self._lock:
+            self._users-=1
+            if self._users==0 and self._pool is not None:
+                self._pool.shutdown(wait=False)
+                self._pool=None
+                self._size=0
+
+    def submit(self,func:Callable[[],Any])->Future:
+        with self._lock:
+            return self._pool.submit(func)
+
+
+shared_executor=SharedExecutor()
+# Unflushed writes beyond this are sent right away instead of waiting out
+# the coalescing window.
+WRITE_HIGH_WATER=64*1024
 
 
 class serialAsync:
@@ -20,149 +76,434 @@ class serialAsync:
         write_timeout:Optional[float]=None,
         loop: Optional[asyncio.AbstractEventLoop] = None,
         buffer_reset_before_write:bool=False,
+        transport:TransportMode='auto',
+        write_coalesce_window:float=0.001,
     ) -> 'serialAsync':
         loop = loop or asyncio.get_running_loop()
-        executor=ThreadPoolExecutor(max_workers=1)
-        serial = await loop.run_in_executor(
-            executor=executor,
-            func=partial(
-                serial_for_url,
-                url=port,
-                baudrate=baud_rate,
-                timeout=time_out,
-                write_timeout=write_timeout,
-            )
+        open_serial=partial(
+            serial_for_url,
+            url=port,
+            baudrate=baud_rate,
+            timeout=time_out,
+            write_timeout=write_timeout,
         )
+        # URL handlers (socket://, rfc2217://, loop://) have no tty fd.
+        native=transport!='executor' and os.name=='posix' and '://' not in port
+        if transport=='native' and not native:
+            raise ValueError(f"{port}: native transport needs a POSIX tty path")
+        executor=None
+        if native:
+            # Opening a tty is a few quick syscalls, fine to do on the loop.
+            serial=open_serial()
+            if not supports_native(serial):
+                serial.close()
+                raise ValueError(f"{port}: native transport needs a POSIX tty path")
+            os.set_blocking(serial.fileno(),False)
+        else:
+            executor=shared_executor
+            executor.acquire()
+            try:
+                serial = await asyncio.wrap_future(executor.submit(open_serial),loop=loop)
+            except BaseException:
+                executor.release()
+                raise
         return cls(
             serial=serial,
             executor=executor,
             loop=loop,
-            buffer_reset_before_write=buffer_reset_before_write
+            buffer_reset_before_write=buffer_reset_before_write,
+            acquired=True,
+            write_coalesce_window=write_coalesce_window,
         )
-    
+
     def __init__(
         self,
         serial:Serial,
-        executor:ThreadPoolExecutor,
+        executor:Optional[SharedExecutor],
         loop:asyncio.AbstractEventLoop,
         buffer_reset_before_write:bool,
+        acquired:bool=False,
+        write_coalesce_window:float=0.001,
     )->None:
         self._serial=serial
         self._executor=executor
+        if executor is not None and not acquired:
+            executor.acquire()
+        # Whether this port holds a reference on the executor; close() gives it back.
+        self._held=executor is not None
+        # Serialises this port's operations, in call order, in both modes.
+        self._io_lock=asyncio.Lock()
         self._loop=loop
         self._buffer_reset_before_write=buffer_reset_before_write
+        # Without an executor every operation runs on the loop against the
+        # non-blocking fd.
+        self._native=executor is None
+        # Received bytes not yet returned; the port is read in chunks, so
+        # whatever arrives past a delimiter waits here for the next call.
+        self._rx=bytearray()
+        # The native read or write waiting on the fd: (future, remove, fd).
+        self._waiter:Optional[Tuple[asyncio.Future,Callable[[int],bool],int]]=None
+        # How much of _rx is known not to contain the current delimiter.
+        self._scanned=0
+        # Bytes from write(flush=False) waiting to go out together.
+        self._tx=bytearray()
+        self._tx_lock=asyncio.Lock()
+        self._coalesce_window=write_coalesce_window
+        self._flusher:Optional[asyncio.Task]=None
+        # A failed background send, raised by the next write() or flush().
+        self._tx_error:Optional[BaseException]=None
+
+    @property
+    def native(self)->bool:
+        return self._native
 
     async def read_until(
             self,
             match:bytes,
     )->bytes:
-        return await self._loop.run_in_executor(
-            executor=self._executor,
-            func=partial(
-                self._serial.read_until,expected=match
-            )
-        )
-    
+        if self._native:
+            # add_reader keeps one callback per fd, so concurrent readers
+            # would steal each other's wakeups; they queue up instead.
+            async with self._io_lock:
+                return await self._native_read_until(match)
+        return await self._run(partial(self._sync_read_until,match))
+
     async def write(
             self,
-            data:bytes
+            data:bytes,
+            flush:bool=True,
     )->None:
-         
-        await self._loop.run_in_executor(
-        executor=self._executor,
-        func=partial(self._sync_write,data=data)
-        )
+        """Send ``data`` and wait until the UART has transmitted it.
+
+        With ``flush=False`` the data is only queued: writes made within the
+        coalescing window go out together in one write, in call order, and
+        nothing waits for the transmit to complete. Call flush() for that.
+        """
+        self._raise_tx_error()
+        self._tx+=data
+        if flush:
+            await self._send_pending(drain=True)
+        elif len(self._tx)>=WRITE_HIGH_WATER:
+            await self._send_pending()
+        elif self._flusher is None:
+            self._flusher=self._loop.create_task(self._flush_later())
+
+    async def flush(self)->None:
+        """Send queued writes and wait until the UART has transmitted them."""
+        self._raise_tx_error()
+        await self._send_pending(drain=True)
+
+    def _raise_tx_error(self)->None:
+        error,self._tx_error=self._tx_error,None
+        if error is not None:
+            raise error
+
+    async def _flush_later(self)->None:
+        try:
+            # Writes queued while a batch is being sent form the next batch.
+            while self._tx:
+                await asyncio.sleep(self._coalesce_window)
+                await self._send_pending()
+        except Exception as e:
+            self._tx_error=e
+        finally:
+            self._flusher=None
+
+    async def _send_pending(self,drain:bool=False)->None:
+        async with self._tx_lock:
+            if not self._tx and not drain:
+                return
+            data=bytes(self._tx)
+            self._tx.clear()
+            if self._native:
+                async with self._io_lock:
+                    if data:
+                        await self._native_write(data)
+                    if drain:
+                        await self._drain()
+                return
+            await self._run(partial(self._sync_write,data=data,flush=drain))
+
     def _sync_write(
             self,
-            data:bytes
+            data:bytes,
+            flush:bool=True,
     )->None:
+        if data:
+            if self._buffer_reset_before_write:
+                # Also drops what the chunked reads already pulled in.
+                self.reset_input_buffer()
+            self._serial.write(data=data)
+        if flush:
+            self._serial.flush()
+
+    def _sync_read_until(self,match:bytes)->bytes:
+        # Serial.read_until reads one byte per call; take whatever is waiting
+        # instead. read(1) on an empty port blocks for up to the timeout.
+        # A cancelled call may have scanned for another delimiter.
+        self._scanned=0
+        timeout=self._serial.timeout
+        deadline=None if timeout is None else time.monotonic()+timeout
+        first=True
+        while True:
+            frame=self._take_frame(match)
+            if frame is not None:
+                return frame
+            waiting=self._serial.in_waiting
+            if waiting or first or deadline is None:
+                chunk=self._serial.read(max(1,waiting))
+            else:
+                chunk=self._read_within(deadline-time.monotonic())
+            first=False
+            self._rx+=chunk
+            if not chunk or (deadline is not None and time.monotonic()>=deadline):
+                frame=self._take_frame(match)
+                return self._take_all() if frame is None else frame
+
+    def _read_within(self,remaining:float)->bytes:
+        # Later waits only get what is left of the call's timeout, so the
+        # whole read_until is bounded by it as in native mode.
+        if remaining<=0:
+            return b''
+        timeout=self._serial.timeout
+        self._serial.timeout=remaining
+        try:
+            return self._serial.read(1)
+        finally:
+            self._serial.timeout=timeout
+
+    def _take_frame(self,match:bytes)->Optional[bytes]:
+        # Only bytes appended since the last scan can complete the delimiter,
+        # plus a delimiter's length of overlap.
+        rx=self._rx
+        index=rx.find(match,max(0,self._scanned-len(match)+1))
+        if index<0:
+            self._scanned=len(rx)
+            return None
+        end=index+len(match)
+        data=bytes(rx[:end])
+        del rx[:end]
+        self._scanned=0
+        return data
+
+    def _take_all(self)->bytes:
+        data=bytes(self._rx)
+        self._clear_rx()
+        return data
+
+    def _clear_rx(self)->None:
+        self._rx.clear()
+        self._scanned=0
+
+    async def _run(self,func):
+        if not self._held:
+            # The port is closed, so pyserial fails without blocking.
+            return func()
+        # One operation per port at a time, in call order, like the
+        # single-thread executor each port used to own.
+        async with self._io_lock:
+            job=self._executor.submit(func)
+            future=asyncio.wrap_future(job,loop=self._loop)
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not job.cancel():
+                    # Already running: keep the port busy until the thread
+                    # is done with it.
+                    await asyncio.wait((future,))
+                    if not future.cancelled():
+                        future.exception()
+                raise
+
+    async def _native_read_until(self,match:bytes)->bytes:
+        # Same contract as Serial.read_until: up to and including the match,
+        # or whatever arrived before the timeout ran out.
+        self._scanned=0
+        timeout=self._serial.timeout
+        deadline=None if timeout is None else self._loop.time()+timeout
+        ready=False
+        while True:
+            frame=self._take_frame(match)
+            if frame is not None:
+                return frame
+            if self._read_available():
+                ready=False
+                continue
+            if ready:
+                # A readable tty returning nothing has gone away (e.g. unplugged).
+                raise SerialException('device reports readiness to read but returned no data')
+            remaining=None if deadline is None else deadline-self._loop.time()
+            if remaining is not None and remaining<=0:
+                return self._take_all()
+            ready=await self._wait_ready(self._loop.add_reader,self._loop.remove_reader,remaining)
+
+    def _read_available(self)->bool:
+        try:
+            chunk=os.read(self._serial.fileno(),max(1,self._serial.in_waiting))
+        except BlockingIOError:
+            return False
+        self._rx+=chunk
+        return bool(chunk)
+
+    async def _native_write(self,data:bytes)->None:
         if self._buffer_reset_before_write:
-            self._serial.reset_input_buffer()
-        self._serial.write(data=data)
-        self._serial.flush()
+            self.reset_input_buffer()
+        timeout=self._serial.write_timeout
+        deadline=None if timeout is None else self._loop.time()+timeout
+        fd=self._serial.fileno()
+        view=memoryview(data)
+        while view:
+            try:
+                view=view[os.write(fd,view):]
+                continue
+            except BlockingIOError:
+                pass
+            remaining=None if deadline is None else deadline-self._loop.time()
+            if remaining is not None and remaining<=0:
+                raise SerialTimeoutException('Write timeout')
+            await self._wait_ready(self._loop.add_writer,self._loop.remove_writer,remaining)
+
+    async def _drain(self)->None:
+        # Equivalent of Serial.flush() (tcdrain) without blocking the loop:
+        # sleep for roughly as long as the UART needs for what is queued.
+        while True:
+            pending=self._serial.out_waiting
+            if not pending:
+                return
+            await asyncio.sleep(pending*10/self._serial.baudrate)
+
+    async def _wait_ready(self,add,remove,timeout:Optional[float])->bool:
+        fd=self._serial.fileno()
+        ready=self._loop.create_future()
+        add(fd,lambda:ready.done() or ready.set_result(None))
+        self._waiter=(ready,remove,fd)
+        try:
+            await asyncio.wait_for(ready,timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self._waiter=None
+            remove(fd)
+
+    def _fail_waiter(self)->None:
+        # Fail the pending native read or write before its fd number can be
+        # reused; it would otherwise wait forever on a closed fd.
+        if self._waiter is None:
+            return
+        ready,remove,fd=self._waiter
+        remove(fd)
+        if not ready.done():
+            ready.set_exception(PortNotOpenError())
 
     async def open(self)->None:
-        return await self._loop.run_in_executor(
-            executor=self._executor,func=self._serial.open
-        )
-    
+        self._clear_rx()
+        self._tx.clear()
+        self._tx_error=None
+        if self._native:
+            self._serial.open()
+            os.set_blocking(self._serial.fileno(),False)
+            return
+        if not self._held:
+            self._executor.acquire()
+            self._held=True
+        return await self._run(self._serial.open)
+
     async def close(self)->None:
-        return await self._loop.run_in_executor(
-            executor=self._executor,func=self._serial.close
-        )
-    
+        # A native read waiting on the port holds its lock, which the
+        # queued writes below need.
+        self._fail_waiter()
+        try:
+            # Queued writes were accepted, so they still go out.
+            await self._send_pending()
+        finally:
+            await self._close()
+
+    async def _close(self)->None:
+        self._clear_rx()
+        if self._native:
+            self._fail_waiter()
+            return self._serial.close()
+        if not self._held:
+            return self._serial.close()
+        try:
+            return await self._run(self._serial.close)
+        finally:
+            self._executor.release()
+            self._held=False
+
     async def is_open(self)->bool:
 
-        return self._serial.is_open is True    
-        
+        return self._serial.is_open is True
+
     def reset_input_buffer(self)->None:
+        self._clear_rx()
         return self._serial.reset_input_buffer()
 
     @contextlib.asynccontextmanager
     async  def override_timeout(self,timeoutproperty:Timeoutproperties,timeout:Optional[float])->AsyncGenerator[None,None]:
         default_timeout=getattr(self._serial,timeoutproperty)
-        override= timeout is not None and default_timeout!=timeout       
+        override= timeout is not None and default_timeout!=timeout
         try:
-            if override: 
-                await self._loop.run_in_executor(
-                executor=self._executor,
-                func= lambda: setattr(self._serial,timeoutproperty,timeout),
-                )
+            if override:
+                await self._set_timeout(timeoutproperty,timeout)
             yield
         finally:
             if override:
-                await self._loop.run_in_executor(
-                    executor=self._executor,
-                    func=lambda:setattr(self._serial,timeoutproperty,default_timeout),
-                )
-            
+                await self._set_timeout(timeoutproperty,default_timeout)
+
+    async def _set_timeout(self,timeoutproperty:Timeoutproperties,timeout:Optional[float])->None:
+        if self._native:
+            # Only a termios update; the native transport reads it per call.
+            setattr(self._serial,timeoutproperty,timeout)
+            return
+        await self._run(lambda: setattr(self._serial,timeoutproperty,timeout))
+
 if __name__ == '__main__':
-    import asyncio
     import time
 
-async def main():
-    loop = asyncio.get_running_loop()
-    serial = await serialAsync.create(
-        port='/dev/pts/7',  # Use one of the socat ports here
-        baud_rate=9600,
-        time_out=1.0,
-        write_timeout=1.0,
-        buffer_reset_before_write=True,
-        loop=loop
-    )
-    cerial=await serialAsync.create(
-        port='/dev/pts/8',
-        baud_rate=100000,
-        time_out=1.0,
-        write_timeout=1.0,
-        buffer_reset_before_write=True,
-        loop=loop
-    )
-    try:
-        print("Waiting for data...")
-        while True:
-            print(f"{time.time():.2f} - serial sent yooo")
-            await serial.write(b'technoculture')
-            port1_response = await cerial.read_until(b'\n')
-            print(f"{time.time():.2f} - cerial sent noooooo")
-            await cerial.write(b'vastuvihar')
-            response = await serial.read_until(b'\n')
-            
-            if port1_response:
-                print(f"{time.time():.2f} - Received from cerial: {port1_response.decode().strip()}")
-            else:
-                print(f"{time.time():.2f} - No data received from cerial (timeout)")
-            
-            if response:
-                print(f"{time.time():.2f} - Received from serial: {response.decode().strip()}")
-            else:
-                print(f"{time.time():.2f} - No data received from serial (timeout)")
-    except asyncio.CancelledError:
-        print("Operation cancelled")
-    finally:
-        await serial.close()
-        await cerial.close()
-
-# Run the main coroutine
-asyncio.run(main())
-    # Run the main coroutine1
\ No newline at end of file
+    async def main():
+        loop = asyncio.get_running_loop()
+        serial = await serialAsync.create(
+            port='/dev/pts/7',  # Use one of the socat ports here
+            baud_rate=9600,
+            time_out=1.0,
+            write_timeout=1.0,
+            buffer_reset_before_write=True,
+            loop=loop
+        )
+        cerial=await serialAsync.create(
+            port='/dev/pts/8',
+            baud_rate=100000,
+            time_out=1.0,
+            write_timeout=1.0,
+            buffer_reset_before_write=True,
+            loop=loop
+        )
+        try:
+            print("Waiting for data...")
+            while True:
+                print(f"{time.time():.2f} - serial sent yooo")
+                await serial.write(b'technoculture')
+                port1_response = await cerial.read_until(b'\n')
+                print(f"{time.time():.2f} - cerial sent noooooo")
+                await cerial.write(b'vastuvihar')
+                response = await serial.read_until(b'\n')
+
+                if port1_response:
+                    print(f"{time.time():.2f} - Received from cerial: {port1_response.decode().strip()}")
+                else:
+                    print(f"{time.time():.2f} - No data received from cerial (timeout)")
+
+                if response:
+                    print(f"{time.time():.2f} - Received from serial: {response.decode().strip()}")
+                else:
+                    print(f"{time.time():.2f} - No data received from serial (timeout)")
+        except asyncio.CancelledError:
+            print("Operation cancelled")
+        finally:
+            await serial.close()
+            await cerial.close()
+
+    # Run the main coroutine
+    asyncio.run(main())
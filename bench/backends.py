@@ -0,0 +1,175 @@
+"""Compare event loop and protocol backends on the same workloads.
+
+Each combination of ``--loops`` and ``--ws`` (and ``--http``) is started
+with ``launch.py`` and driven with the /ps workloads from ``ps_load.py``.
+Combinations whose backend is not installed are reported as skipped.
+
+With ``--publish`` the publisher app is benchmarked too: keep-alive clients
+POST to /publish and the request latency is recorded. The publisher hands
+every message to Dapr, so a Dapr sidecar must be reachable from it (for
+example ``dapr run --app-id publisher --dapr-grpc-port 50001``);
+without one every request fails and the run only measures the error path.
+
+Example:
+    python bench/backends.py --clients 2000 --duration 10 --json
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+import ps_load
+
+sys.path.insert(0, ps_load.ROOT)
+from launch import HTTP_BACKENDS, LOOPS, WS_BACKENDS, missing_backends  # noqa: E402
+
+LAUNCHER = os.path.join(ps_load.ROOT, "launch.py")
+
+
+def start_app(app: str, port: int, loop: str, ws: str, http: str, env: Optional[Dict[str, str]] = None) -> subprocess.Popen:
+    command = [
+        sys.executable, LAUNCHER, app,
+        "--loop", loop, "--ws", ws, "--http", http,
+        "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning",
+    ]
+    process = subprocess.Popen(command, cwd=ps_load.ROOT, env={**os.environ, **(env or {})})
+    try:
+        ps_load.wait_for_port(port)
+    except RuntimeError:
+        stop(process)
+        raise
+    return process
+
+
+def stop(process: subprocess.Popen) -> None:
+    process.terminate()
+    process.wait()
+
+
+async def _post_loop(port: int, deadline: float, latencies: List[float]) -> Dict[str, int]:
+    """One keep-alive HTTP/1.1 client posting to /publish until ``deadline``."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    counts = {"ok": 0, "failed": 0}
+    try:
+        while time.monotonic() < deadline:
+            body = json.dumps({"sent": time.time()}).encode()
+            started = time.monotonic()
+            writer.write(
+                b"POST /publish HTTP/1.1\r\nHost: bench\r\nContent-Type: application/json\r\n"
+                b"Content-Length: " + str(len(body)).encode() + b"\r\n\r\n" + body
+            )
+            status_line = await reader.readline()
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b""):
+                    break
+                name, _, value = line.partition(b":")
+                if name.strip().lower() == b"content-length":
+                    length = int(value)
+            await reader.readexactly(length)
+            latencies.append(time.monotonic() - started)
+            counts["ok" if status_line.split()[1:2] == [b"200"] else "failed"] += 1
+    finally:
+        writer.close()
+    return counts
+
+
+def run_publish(port: int, clients: int, duration: float) -> dict:
+    latencies: List[float] = []
+
+    async def run():
+        deadline = time.monotonic() + duration
+        return await asyncio.gather(*(_post_loop(port, deadline, latencies) for _ in range(clients)))
+
+    started = time.monotonic()
+    results = asyncio.run(run())
+    elapsed = time.monotonic() - started
+    ok = sum(r["ok"] for r in results)
+    failed = sum(r["failed"] for r in results)
+    ordered = sorted(latencies)
+    return {
+        "workload": "publish",
+        "clients": clients,
+        "duration_s": round(elapsed, 3),
+        "messages": ok,
+        "throughput_msg_s": round(ok / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(ps_load.percentile(ordered, 0.50) * 1000, 3),
+        "p99_ms": round(ps_load.percentile(ordered, 0.99) * 1000, 3),
+        "p999_ms": round(ps_load.percentile(ordered, 0.999) * 1000, 3),
+        "errors": [f"{failed} requests failed"] if failed else [],
+    }
+
+
+def report(result: dict, as_json: bool) -> None:
+    if as_json:
+        print(json.dumps(result), flush=True)
+        return
+    backend = f"loop={result['loop']:<7} ws={result['ws']:<10} http={result['http']:<9}"
+    if "skipped" in result:
+        print(f"{backend} {result.get('workload', ''):<10} skipped ({result['skipped']})", flush=True)
+        return
+    print(
+        f"{backend} {result['workload']:<10} clients={result['clients']} "
+        f"msgs/s={result['throughput_msg_s']} "
+        f"p50={result['p50_ms']}ms p99={result['p99_ms']}ms p999={result['p999_ms']}ms"
+        + (f" rss={result['server_peak_rss_mb']}MB" if result.get("server_peak_rss_mb") else "")
+        + (f" errors={len(result['errors'])}" if result["errors"] else ""),
+        flush=True,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark /ps and /publish under each backend.")
+    parser.add_argument("--loops", nargs="+", choices=LOOPS, default=["asyncio", "uvloop"])
+    parser.add_argument("--ws", nargs="+", choices=WS_BACKENDS, default=["websockets", "wsproto"])
+    parser.add_argument("--http", nargs="+", choices=HTTP_BACKENDS, default=["auto"])
+    parser.add_argument("--workload", choices=ps_load.WORKLOADS + ("all",), default="all")
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--procs", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--rate", type=float, default=100.0, help="broadcast publishes per second")
+    parser.add_argument("--publish", action="store_true", help="also benchmark /publish (needs a Dapr sidecar)")
+    parser.add_argument("--publish-clients", type=int, default=64)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--json", action="store_true", help="print results as JSON lines")
+    args = parser.parse_args()
+
+    ps_load.raise_fd_limit()
+    workloads = ps_load.WORKLOADS if args.workload == "all" else (args.workload,)
+    for loop, ws, http in itertools.product(args.loops, args.ws, args.http):
+        backend = {"loop": loop, "ws": ws, "http": http}
+        missing = missing_backends(loop, ws, http)
+        if missing:
+            report({**backend, "skipped": f"not installed: {', '.join(missing)}"}, args.json)
+            continue
+        server = start_app("main", args.port, loop, ws, http)
+        try:
+            for workload in workloads:
+                result = ps_load.run_workload(
+                    f"ws://127.0.0.1:{args.port}/ps", workload, args.clients, args.procs,
+                    args.duration, args.rate, server.pid,
+                )
+                report({**backend, **result}, args.json)
+        finally:
+            stop(server)
+        if args.publish and ws == args.ws[0]:
+            # /publish is plain HTTP, so it only varies with the loop and HTTP stack.
+            try:
+                publisher = start_app("publisher", args.port, loop, ws, http)
+            except RuntimeError as e:
+                report({**backend, "workload": "publish", "skipped": str(e)}, args.json)
+                continue
+            try:
+                report({**backend, **run_publish(args.port, args.publish_clients, args.duration)}, args.json)
+            finally:
+                stop(publisher)
+
+
+if __name__ == "__main__":
+    main()
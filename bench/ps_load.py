@@ -0,0 +1,313 @@
+"""Load test for the /ps WebSocket endpoint.
+
+Starts ``main:app`` (as a subprocess by default, or in this process, or not at
+all with ``--server none``), opens many concurrent clients from several driver
+processes and reports throughput, round-trip latency percentiles and the
+server's resident memory.
+
+Workloads:
+    echo       every client sends plain text and waits for the echo
+    broadcast  one publisher sends to a topic every client subscribes to
+    subscribe  every client publishes to its own topic and waits for delivery
+
+Example:
+    python bench/ps_load.py --workload broadcast --clients 5000 --procs 4
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import resource
+import socket
+import subprocess
+import sys
+import threading
+import time
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+import websockets
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKLOADS = ("echo", "broadcast", "subscribe")
+CONNECT_CONCURRENCY = 200
+PONG = json.dumps({"action": "pong"})
+
+
+def start_server(app: str, port: int, extra_args: List[str] = (), env: Optional[Dict[str, str]] = None) -> subprocess.Popen:
+    """Run ``app`` under uvicorn in a subprocess and wait until it accepts connections."""
+    command = [
+        sys.executable, "-m", "uvicorn", app,
+        "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning",
+        *extra_args,
+    ]
+    process = subprocess.Popen(command, cwd=ROOT, env={**os.environ, **(env or {})})
+    wait_for_port(port)
+    return process
+
+
+def start_server_in_process(app: str, port: int) -> threading.Thread:
+    import uvicorn
+
+    sys.path.insert(0, ROOT)
+    config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    wait_for_port(port)
+    return thread
+
+
+def wait_for_port(port: int, timeout: float = 15.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Server did not start listening on port {port}")
+
+
+def rss_bytes(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, int(fraction * len(values)))
+    return values[index]
+
+
+def raise_fd_limit() -> None:
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+async def _connect_all(url: str, count: int) -> list:
+    gate = asyncio.Semaphore(CONNECT_CONCURRENCY)
+
+    async def connect():
+        async with gate:
+            return await websockets.connect(url, max_queue=None, open_timeout=30)
+
+    return await asyncio.gather(*(connect() for _ in range(count)))
+
+
+async def _echo(sockets: list, deadline: float, latencies: array) -> int:
+    async def client(ws):
+        sent = 0
+        while time.monotonic() < deadline:
+            start = time.monotonic()
+            await ws.send(f"bench {start}")
+            await ws.recv()
+            latencies.append(time.monotonic() - start)
+            sent += 1
+        return sent
+
+    return sum(await asyncio.gather(*(client(ws) for ws in sockets)))
+
+
+async def _subscribe(sockets: list, deadline: float, latencies: array, worker: int) -> int:
+    async def client(index, ws):
+        topic = f"bench-{worker}-{index}"
+        await ws.send(json.dumps({"action": "subscribe", "topic": topic}))
+        received = 0
+        while time.monotonic() < deadline:
+            await ws.send(json.dumps({"action": "publish", "topic": topic, "data": time.monotonic()}))
+            frame = json.loads(await ws.recv())
+            latencies.append(time.monotonic() - frame["data"])
+            received += 1
+        return received
+
+    return sum(await asyncio.gather(*(client(i, ws) for i, ws in enumerate(sockets))))
+
+
+async def _broadcast(sockets: list, deadline: float, latencies: array, publisher: bool, rate: float) -> int:
+    async def publish():
+        ws = sockets[0]
+        interval = 1.0 / rate
+        next_send = time.monotonic()
+        while next_send < deadline:
+            await ws.send(json.dumps({"action": "publish", "topic": "bench", "data": time.monotonic()}))
+            next_send += interval
+            await asyncio.sleep(max(0.0, next_send - time.monotonic()))
+
+    async def client(ws):
+        received = 0
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                frame = json.loads(await asyncio.wait_for(ws.recv(), remaining))
+                if frame.get("topic") == "bench":
+                    latencies.append(time.monotonic() - frame["data"])
+                    received += 1
+                elif frame.get("event") == "ping":
+                    # Receivers are otherwise silent and would hit the idle timeout.
+                    await ws.send(PONG)
+        except asyncio.TimeoutError:
+            pass
+        except websockets.ConnectionClosed:
+            # Closed by the server (e.g. shutdown); keep what it received.
+            pass
+        return received
+
+    tasks = [client(ws) for ws in sockets]
+    if publisher:
+        tasks.append(publish())
+    results = await asyncio.gather(*tasks)
+    return sum(r for r in results if r)
+
+
+def _driver(worker: int, url: str, workload: str, clients: int, duration: float, rate: float, ready, start_barrier, results) -> None:
+    raise_fd_limit()
+    latencies = array("d")
+
+    async def run() -> Tuple[int, float]:
+        loop = asyncio.get_running_loop()
+        sockets = await _connect_all(url, clients)
+        try:
+            if workload == "broadcast":
+                for ws in sockets:
+                    await ws.send(json.dumps({"action": "subscribe", "topic": "bench"}))
+            await loop.run_in_executor(None, start_barrier.wait)
+            # Every driver starts its clock together, once all subscribes are in.
+            await loop.run_in_executor(None, ready.wait)
+            started = time.monotonic()
+            deadline = started + duration
+            if workload == "echo":
+                count = await _echo(sockets, deadline, latencies)
+            elif workload == "subscribe":
+                count = await _subscribe(sockets, deadline, latencies, worker)
+            else:
+                count = await _broadcast(sockets, deadline, latencies, worker == 0, rate)
+            return count, time.monotonic() - started
+        finally:
+            await asyncio.gather(*(ws.close() for ws in sockets), return_exceptions=True)
+
+    try:
+        count, elapsed = asyncio.run(run())
+        results.put((worker, count, elapsed, latencies.tobytes(), None))
+    except Exception as e:
+        results.put((worker, 0, 0.0, b"", repr(e)))
+
+
+def run_workload(url: str, workload: str, clients: int, procs: int, duration: float, rate: float = 100.0, server_pid: Optional[int] = None) -> dict:
+    """Drive ``clients`` connections split over ``procs`` processes and summarise the run."""
+    context = multiprocessing.get_context("spawn")
+    ready = context.Event()
+    start_barrier = context.Barrier(procs + 1)
+    results = context.Queue()
+    per_proc = [clients // procs + (1 if i < clients % procs else 0) for i in range(procs)]
+    workers = [
+        context.Process(
+            target=_driver,
+            args=(i, url, workload, n, duration, rate, ready, start_barrier, results),
+        )
+        for i, n in enumerate(per_proc)
+    ]
+    for process in workers:
+        process.start()
+    start_barrier.wait()
+    # Give every driver a moment to send its subscribes before publishing.
+    time.sleep(0.5)
+    ready.set()
+    peak_rss = 0
+    collected = []
+    while len(collected) < procs:
+        if server_pid is not None:
+            peak_rss = max(peak_rss, rss_bytes(server_pid))
+        try:
+            collected.append(results.get(timeout=0.5))
+        except Exception:
+            if not any(p.is_alive() for p in workers) and results.empty():
+                break
+    for process in workers:
+        process.join()
+
+    latencies = array("d")
+    messages = 0
+    # Drivers run side by side; the longest one is the measured interval.
+    elapsed = 0.0
+    errors = []
+    for _, count, interval, raw, error in collected:
+        messages += count
+        elapsed = max(elapsed, interval)
+        latencies.frombytes(raw)
+        if error:
+            errors.append(error)
+    ordered = sorted(latencies)
+    return {
+        "workload": workload,
+        "clients": clients,
+        "procs": procs,
+        "duration_s": round(elapsed, 3),
+        "messages": messages,
+        "throughput_msg_s": round(messages / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(ordered, 0.50) * 1000, 3),
+        "p99_ms": round(percentile(ordered, 0.99) * 1000, 3),
+        "p999_ms": round(percentile(ordered, 0.999) * 1000, 3),
+        "server_peak_rss_mb": round(peak_rss / 2**20, 1) if server_pid else None,
+        "errors": errors,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load test the /ps WebSocket endpoint.")
+    parser.add_argument("--workload", choices=WORKLOADS + ("all",), default="all")
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--procs", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--rate", type=float, default=100.0, help="broadcast publishes per second")
+    parser.add_argument("--server", choices=("subprocess", "inprocess", "none"), default="subprocess")
+    parser.add_argument("--app", default="main:app")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--url", help="WebSocket URL to test; defaults to the started server's /ps")
+    parser.add_argument("--json", action="store_true", help="print results as JSON lines")
+    args = parser.parse_args()
+
+    raise_fd_limit()
+    server = None
+    server_pid = None
+    if args.server == "subprocess":
+        server = start_server(args.app, args.port)
+        server_pid = server.pid
+    elif args.server == "inprocess":
+        start_server_in_process(args.app, args.port)
+        server_pid = os.getpid()
+    url = args.url or f"ws://127.0.0.1:{args.port}/ps"
+
+    workloads = WORKLOADS if args.workload == "all" else (args.workload,)
+    try:
+        for workload in workloads:
+            result = run_workload(url, workload, args.clients, args.procs, args.duration, args.rate, server_pid)
+            if args.json:
+                print(json.dumps(result))
+            else:
+                print(
+                    f"{workload:<10} clients={result['clients']} "
+                    f"msgs/s={result['throughput_msg_s']} "
+                    f"p50={result['p50_ms']}ms p99={result['p99_ms']}ms p999={result['p999_ms']}ms "
+                    f"rss={result['server_peak_rss_mb']}MB"
+                    + (f" errors={len(result['errors'])}" if result["errors"] else "")
+                )
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""Run one of the project's apps with an explicit event loop and protocol stack.
+
+uvicorn's "auto" picks uvloop and httptools when they happen to be installed,
+so the same command can run on different stacks on different machines. This
+launcher makes the choice explicit and fails if the requested backend is
+missing instead of silently falling back.
+
+Examples:
+    python launch.py main --loop uvloop --ws websockets
+    python launch.py publisher --loop asyncio --http h11
+    python launch.py subscriber --ws wsproto --port 8001
+"""
+import argparse
+import importlib.util
+import logging
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+from typing import List, Optional
+
+import uvicorn
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# name -> (import string, directory it is imported from, default port)
+APPS = {
+    "main": ("main:app", ROOT, 8000),
+    # The dapr/ directory is not a package (and would shadow the Dapr SDK if
+    # it were imported as one), so its scripts are imported from inside it.
+    "publisher": ("publisher:app", os.path.join(ROOT, "dapr"), 8000),
+    "subscriber": ("subscriber:app", os.path.join(ROOT, "dapr"), 8001),
+}
+LOOPS = ("auto", "asyncio", "uvloop")
+WS_BACKENDS = ("auto", "websockets", "websockets-sansio", "wsproto")
+HTTP_BACKENDS = ("auto", "h11", "httptools")
+# Backend name -> module it needs.
+MODULES = {
+    "uvloop": "uvloop",
+    "websockets": "websockets",
+    "websockets-sansio": "websockets",
+    "wsproto": "wsproto",
+    "h11": "h11",
+    "httptools": "httptools",
+}
+
+log = logging.getLogger("launch")
+
+
+class DrainingServer(uvicorn.Server):
+    """A uvicorn server that lets the app drain its WebSockets on shutdown.
+
+    uvicorn fails every open WebSocket as soon as shutdown starts, before
+    the app's lifespan shutdown runs. This stops listening first, then awaits
+    the app's ``app.state.drain`` if it has one, and only then lets uvicorn
+    continue its normal shutdown.
+    """
+
+    async def shutdown(self, sockets=None) -> None:
+        for server in self.servers:
+            server.close()
+        drain = _find_drain(self.config.loaded_app)
+        if drain is not None:
+            try:
+                await drain()
+            except Exception:
+                log.exception("Drain failed")
+        await super().shutdown(sockets=sockets)
+
+
+def _find_drain(app):
+    # uvicorn wraps the app in middleware that keeps the inner app as ``.app``.
+    while app is not None:
+        state = getattr(app, "state", None)
+        if state is not None:
+            return getattr(state, "drain", None)
+        app = getattr(app, "app", None)
+    return None
+
+
+def serve_workers(config: uvicorn.Config, workers: int) -> None:
+    """Run ``workers`` DrainingServer processes on one listening socket.
+
+    uvicorn's own supervisor builds plain Servers in its workers, which
+    would skip the drain. SIGINT and SIGTERM are passed on to every worker,
+    which then drains like a single-process server. A worker that dies on
+    its own is replaced.
+    """
+    sock = config.bind_socket()
+    stopping = threading.Event()
+    context = multiprocessing.get_context("spawn")
+
+    def spawn():
+        process = context.Process(target=_run_worker, args=(config, sock))
+        process.start()
+        return process
+
+    def stop(signum, frame):
+        stopping.set()
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    processes = [spawn() for _ in range(workers)]
+    while not stopping.wait(0.5):
+        for index, process in enumerate(processes):
+            if not process.is_alive():
+                log.warning(f"Worker {process.pid} exited with {process.exitcode}; restarting it")
+                processes[index] = spawn()
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+    for process in processes:
+        process.join()
+    sock.close()
+
+
+def _run_worker(config: uvicorn.Config, sock) -> None:
+    # Runs in a fresh interpreter, so logging is set up again.
+    config.configure_logging()
+    try:
+        DrainingServer(config).run(sockets=[sock])
+    except KeyboardInterrupt:
+        pass
+
+
+def missing_backends(loop: str, ws: str, http: str) -> List[str]:
+    """The explicitly requested backends that cannot be used on this machine."""
+    missing = []
+    for name in (loop, ws, http):
+        if name not in MODULES:
+            continue
+        if name == "uvloop" and sys.platform == "win32":
+            missing.append("uvloop (not supported on Windows)")
+        elif importlib.util.find_spec(MODULES[name]) is None:
+            missing.append(name)
+    return missing
+
+
+def build_config(
+    app: str,
+    loop: str = "auto",
+    ws: str = "auto",
+    http: str = "auto",
+    host: str = "0.0.0.0",
+    port: Optional[int] = None,
+    log_level: str = "info",
+) -> uvicorn.Config:
+    target, directory, default_port = APPS[app]
+    if directory not in sys.path:
+        sys.path.insert(0, directory)
+    return uvicorn.Config(
+        target,
+        host=host,
+        port=port or default_port,
+        loop=loop,
+        ws=ws,
+        http=http,
+        log_level=log_level,
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Run an app on a chosen event loop and protocol stack.")
+    parser.add_argument("app", choices=sorted(APPS))
+    parser.add_argument("--loop", choices=LOOPS, default="auto")
+    parser.add_argument("--ws", choices=WS_BACKENDS, default="auto")
+    parser.add_argument("--http", choices=HTTP_BACKENDS, default="auto")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, help="defaults to the port the app's own script uses")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args(argv)
+
+    missing = missing_backends(args.loop, args.ws, args.http)
+    if missing:
+        parser.error(f"backend not available: {', '.join(missing)}")
+    logging.basicConfig(level=logging.INFO)
+    log.info(f"Starting {args.app} with loop={args.loop} ws={args.ws} http={args.http}")
+    config = build_config(
+        args.app,
+        loop=args.loop,
+        ws=args.ws,
+        http=args.http,
+        host=args.host,
+        port=args.port,
+        log_level=args.log_level,
+    )
+    if args.workers > 1:
+        serve_workers(config, args.workers)
+        return
+    DrainingServer(config).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,29 +1,289 @@
-import os
-from fastapi import FastAPI, WebSocket
-from fastapi.websockets import WebSocketDisconnect
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-
-app = FastAPI()
-
-# Mount the static files directory
-app.mount("/static", StaticFiles(directory="."), name="static")
-
-@app.get("/")
-async def get():
-    current_dir = os.path.dirname(os.path.realpath(__file__))
-    html_file_path = os.path.join(current_dir, "index.html")
-    if os.path.exists(html_file_path):
-        return FileResponse(html_file_path)
-    else:
-        return {"error": f"File not found: {html_file_path}"}
-
-@app.websocket("/ps")
-async def websocket_endpoint(websocket: WebSocket):
-    await websocket.accept()
-    try:
-        while True:
-            data = await websocket.receive_text()
-            await websocket.send_text(f"Message received: {data}")
-    except WebSocketDisconnect:
-        print("Client disconnected")
\ No newline at end of file
+import os
+import json
+import time
+import random
+import asyncio
+from typing import Optional
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request, WebSocket
+from fastapi.websockets import WebSocketDisconnect
+from fastapi.responses import Response, StreamingResponse
+
+from server import Broker, Connection, Heartbeat, OverflowPolicy, TimerWheel, WorkerBus, metrics
+from server.admission import REJECT_CODE, Admission
+from server.aggregate import DerivedTopics
+from server.ratelimit import InboundAction, InboundLimiter
+from server.static import StaticAssets
+from server.protocol import Protocol, is_control, parse_control
+from server.streams import BufferedSubscriber, EventStream, poll_body
+from server.codec import SUBPROTOCOL as BINARY_SUBPROTOCOL, CodecError, decode as decode_binary
+
+PS_QUEUE_SIZE = int(os.environ.get("PS_QUEUE_SIZE", "1024"))
+PS_OVERFLOW = OverflowPolicy(os.environ.get("PS_OVERFLOW", OverflowPolicy.DROP_OLDEST.value))
+PS_SEND_TIMEOUT = float(os.environ.get("PS_SEND_TIMEOUT", "5"))
+# Batching is off unless a window is given here or with ?batch_ms= on /ps.
+PS_BATCH_MS = float(os.environ.get("PS_BATCH_MS", "0"))
+PS_BATCH_BYTES = int(os.environ.get("PS_BATCH_BYTES", str(64 * 1024)))
+# Per-topic history kept for clients that resubscribe with "since".
+PS_REPLAY_SIZE = int(os.environ.get("PS_REPLAY_SIZE", "256"))
+PS_REPLAY_SECONDS = float(os.environ.get("PS_REPLAY_SECONDS", "0")) or None
+# History of topics nobody is subscribed to is kept for this many topics,
+# least recently published first out, since clients pick the topic names.
+PS_REPLAY_IDLE_TOPICS = int(os.environ.get("PS_REPLAY_IDLE_TOPICS", "1024"))
+# Server pings after PS_PING_INTERVAL seconds of client silence and closes
+# the socket after PS_IDLE_TIMEOUT. A PS_PING_INTERVAL of 0 disables both;
+# a PS_IDLE_TIMEOUT of 0 keeps the pings but never closes.
+PS_PING_INTERVAL = float(os.environ.get("PS_PING_INTERVAL", "20"))
+PS_IDLE_TIMEOUT = float(os.environ.get("PS_IDLE_TIMEOUT", "60"))
+# HTTP fallbacks for clients that cannot keep a WebSocket open.
+PS_SSE_KEEPALIVE = float(os.environ.get("PS_SSE_KEEPALIVE", "15"))
+PS_POLL_TIMEOUT = float(os.environ.get("PS_POLL_TIMEOUT", "25"))
+# Only files in this directory are served, from memory, under /static.
+STATIC_DIR = os.environ.get(
+    "STATIC_DIR", os.path.join(os.path.dirname(os.path.realpath(__file__)), "static")
+)
+STATIC_MAX_AGE = int(os.environ.get("STATIC_MAX_AGE", str(24 * 3600)))
+# Admission control for /ps; 0 disables a limit. The handshake rate is
+# connections per second across all clients, with bursts of PS_HANDSHAKE_BURST.
+PS_MAX_CONNECTIONS = int(os.environ.get("PS_MAX_CONNECTIONS", "0"))
+PS_MAX_CONNECTIONS_PER_IP = int(os.environ.get("PS_MAX_CONNECTIONS_PER_IP", "0"))
+PS_HANDSHAKE_RATE = float(os.environ.get("PS_HANDSHAKE_RATE", "0"))
+PS_HANDSHAKE_BURST = int(os.environ.get("PS_HANDSHAKE_BURST", "100"))
+# Per-connection limits on what a client sends to /ps; 0 disables a limit.
+# Over the limit a message is dropped, delayed until it fits, or the socket
+# is closed with 1008, depending on PS_INBOUND_ACTION.
+PS_INBOUND_RATE = float(os.environ.get("PS_INBOUND_RATE", "0"))
+PS_INBOUND_BURST = float(os.environ.get("PS_INBOUND_BURST", "50"))
+PS_INBOUND_BYTES_RATE = float(os.environ.get("PS_INBOUND_BYTES_RATE", "0"))
+PS_INBOUND_BYTES_BURST = float(os.environ.get("PS_INBOUND_BYTES_BURST", str(256 * 1024)))
+PS_INBOUND_ACTION = InboundAction(os.environ.get("PS_INBOUND_ACTION", InboundAction.DELAY.value))
+# Shared directory for the inter-worker bus; set it when running with --workers.
+PS_BUS_DIR = os.environ.get("PS_BUS_DIR")
+# On shutdown, queued frames get PS_DRAIN_TIMEOUT seconds to go out. Each
+# client is then told to reconnect after a random delay in this range, so
+# they do not all come back at once.
+PS_DRAIN_TIMEOUT = float(os.environ.get("PS_DRAIN_TIMEOUT", "10"))
+PS_RECONNECT_MIN_MS = int(os.environ.get("PS_RECONNECT_MIN_MS", "500"))
+PS_RECONNECT_MAX_MS = int(os.environ.get("PS_RECONNECT_MAX_MS", "15000"))
+
+broker = Broker(
+    replay_size=PS_REPLAY_SIZE, replay_age=PS_REPLAY_SECONDS, max_idle_topics=PS_REPLAY_IDLE_TOPICS
+)
+timers = TimerWheel(tick=0.1)
+# Topics named "<source>@<period>" carry windowed aggregates of <source>.
+derived = DerivedTopics(broker, timers)
+protocol = Protocol(broker, derived)
+heartbeat = Heartbeat(timers, PS_PING_INTERVAL, PS_IDLE_TIMEOUT) if PS_PING_INTERVAL else None
+admission = Admission(
+    max_connections=PS_MAX_CONNECTIONS,
+    max_per_ip=PS_MAX_CONNECTIONS_PER_IP,
+    handshake_rate=PS_HANDSHAKE_RATE,
+    handshake_burst=PS_HANDSHAKE_BURST,
+)
+loop_monitor = metrics.LoopMonitor()
+metrics.REGISTRY.gauge("ps_connections", "Open /ps connections.", lambda: len(broker.connections))
+metrics.REGISTRY.gauge(
+    "ps_queued_frames", "Frames waiting in the outbound queues of all /ps connections.",
+    lambda: sum(c.queue_depth for c in broker.connections),
+)
+metrics.REGISTRY.gauge(
+    "ps_max_queue_depth", "Outbound queue depth of the most backed-up /ps connection.",
+    lambda: max((c.queue_depth for c in broker.connections), default=0),
+)
+assets = StaticAssets(STATIC_DIR, cache_control=f"public, max-age={STATIC_MAX_AGE}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    assets.load()
+    timers.start()
+    loop_monitor.start()
+    bus = None
+    if PS_BUS_DIR:
+        bus = WorkerBus(PS_BUS_DIR, broker)
+        bus.start()
+    try:
+        yield
+    finally:
+        # Normally already done by launch.py before the server closes the
+        # sockets. Plain "uvicorn main:app" has closed them with 1012 by now,
+        # so only launch.py (with any --workers) gives clients a real drain.
+        await drain()
+        if bus is not None:
+            bus.close()
+        loop_monitor.stop()
+        timers.stop()
+
+app = FastAPI(lifespan=lifespan)
+
+def reconnect_hint() -> str:
+    return json.dumps({"retry_ms": random.randint(PS_RECONNECT_MIN_MS, PS_RECONNECT_MAX_MS)})
+
+async def drain() -> None:
+    """Refuse new /ps clients, flush the open ones and close them with 1001."""
+    admission.draining = True
+    await broker.drain(PS_DRAIN_TIMEOUT, reconnect_hint)
+
+# Looked up by launch.py, which drains before uvicorn closes the sockets.
+app.state.drain = drain
+
+@app.get("/")
+async def get(request: Request):
+    index = assets.get("index.html")
+    if index is None:
+        return {"error": f"File not found: {os.path.join(STATIC_DIR, 'index.html')}"}
+    # The page URL never changes, so browsers revalidate it with its ETag.
+    return index.response(request.headers, cache_control="no-cache")
+
+@app.get("/static/{path:path}")
+async def static_asset(path: str, request: Request):
+    asset = assets.get(path)
+    if asset is None:
+        raise HTTPException(status_code=404)
+    return asset.response(request.headers)
+
+@app.get("/ps/stats")
+async def ps_stats():
+    return broker.stats()
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    return Response(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+def parse_seq(value) -> Optional[int]:
+    try:
+        return int(value) if value is not None else None
+    except ValueError:
+        return None
+
+@app.get("/sse/{topic}")
+async def sse(topic: str, request: Request):
+    # EventSource sends Last-Event-ID when it reconnects; ids are topic seqs.
+    since = parse_seq(request.headers.get("last-event-id") or request.query_params.get("since"))
+    stream = EventStream(timers, PS_SSE_KEEPALIVE, max_queue=PS_QUEUE_SIZE)
+
+    async def body():
+        derived.ensure(topic)
+        broker.subscribe(topic, stream, since=since)
+        stream.start()
+        try:
+            yield b"retry: 3000\n\n"
+            async for chunk in stream.events():
+                yield chunk
+        finally:
+            stream.closed = True
+            broker.unsubscribe_all(stream)
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/poll/{topic}")
+async def long_poll(topic: str, since: Optional[int] = None, timeout: float = PS_POLL_TIMEOUT):
+    waiter = BufferedSubscriber(max_queue=PS_QUEUE_SIZE)
+    derived.ensure(topic)
+    broker.subscribe(topic, waiter, since=since)
+    try:
+        async with asyncio.timeout(min(timeout, PS_POLL_TIMEOUT)):
+            await waiter.wait()
+    except TimeoutError:
+        pass
+    finally:
+        broker.unsubscribe(topic, waiter)
+    frames = waiter.drain()
+    seq = max((f.seq for f in frames if f.seq is not None), default=None)
+    if seq is None:
+        seq = since if since is not None else broker.last_seq(topic)
+    return Response(poll_body(frames, seq), media_type="application/json")
+
+@app.websocket("/ps")
+async def websocket_endpoint(websocket: WebSocket):
+    ip = websocket.client.host if websocket.client else ""
+    refused = admission.admit(ip)
+    if refused is not None:
+        # Nothing has been allocated for this client yet. The handshake is
+        # completed only so the close code tells it to back off.
+        await websocket.accept()
+        await websocket.close(code=REJECT_CODE, reason=refused)
+        return
+    try:
+        await serve_ps(websocket)
+    finally:
+        admission.release(ip)
+
+async def serve_ps(websocket: WebSocket):
+    params = websocket.query_params
+    try:
+        overflow = OverflowPolicy(params.get("overflow", PS_OVERFLOW))
+        batch_ms = float(params.get("batch_ms", PS_BATCH_MS))
+        batch_bytes = int(params.get("batch_bytes", PS_BATCH_BYTES))
+    except ValueError:
+        await websocket.close(code=1008)
+        return
+    # Clients that offer the binary subprotocol get codec-encoded frames;
+    # everyone else, including index.html, stays on JSON text.
+    binary = BINARY_SUBPROTOCOL in websocket.scope.get("subprotocols", ())
+    await websocket.accept(subprotocol=BINARY_SUBPROTOCOL if binary else None)
+    connection = Connection(
+        websocket,
+        max_queue=PS_QUEUE_SIZE,
+        overflow=overflow,
+        send_timeout=PS_SEND_TIMEOUT,
+        batch_window=batch_ms / 1000,
+        batch_bytes=batch_bytes,
+        binary=binary,
+    )
+    limiter = None
+    if PS_INBOUND_RATE or PS_INBOUND_BYTES_RATE:
+        limiter = InboundLimiter(
+            PS_INBOUND_RATE,
+            PS_INBOUND_BURST,
+            PS_INBOUND_BYTES_RATE,
+            PS_INBOUND_BYTES_BURST,
+            action=PS_INBOUND_ACTION,
+        )
+    broker.attach(connection)
+    if heartbeat is not None:
+        heartbeat.watch(connection)
+    try:
+        while True:
+            event = await websocket.receive()
+            if event["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(event.get("code", 1000))
+            connection.last_seen = time.monotonic()
+            data = event.get("text")
+            size = metrics.utf8_len(data) if data is not None else len(event["bytes"])
+            metrics.MESSAGES_IN.inc()
+            metrics.BYTES_IN.inc(size)
+            if limiter is not None:
+                wait = limiter.acquire(size)
+                if wait:
+                    metrics.THROTTLED.inc()
+                    if limiter.action is InboundAction.CLOSE:
+                        await connection.close(code=1008)
+                        return
+                    if limiter.action is InboundAction.DROP:
+                        continue
+                    # Not reading applies TCP backpressure to the client.
+                    while wait:
+                        await asyncio.sleep(wait)
+                        wait = limiter.acquire(size)
+            if data is not None:
+                message = parse_control(data)
+                if message is None:
+                    connection.send_text(f"Message received: {data}")
+                    continue
+            else:
+                try:
+                    message = decode_binary(event["bytes"])
+                except CodecError:
+                    await connection.close(code=1007)
+                    return
+                if not is_control(message):
+                    continue
+            protocol.dispatch(connection, message)
+    except WebSocketDisconnect:
+        print("Client disconnected")
+    finally:
+        broker.detach(connection)
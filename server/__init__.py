@@ -0,0 +1,18 @@
+from .broker import Broker
+from .bus import WorkerBus
+from .connection import Connection, OverflowPolicy
+from .frame import Frame
+from .heartbeat import Heartbeat
+from .subscription import Subscription
+from .timerwheel import TimerWheel
+
+__all__ = [
+    "Broker",
+    "Connection",
+    "Frame",
+    "Heartbeat",
+    "OverflowPolicy",
+    "Subscription",
+    "TimerWheel",
+    "WorkerBus",
+]
@@ -0,0 +1,63 @@
+from typing import Dict, Optional
+
+from . import metrics
+from .ratelimit import TokenBucket
+
+# "Try Again Later": the client should back off and reconnect.
+REJECT_CODE = 1013
+
+
+class Admission:
+    """Decides whether a /ps handshake may proceed.
+
+    Checked before the socket is accepted and before any per-connection state
+    exists, so a reconnect storm costs one dictionary lookup per rejected
+    client. Each limit is disabled when set to 0.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 0,
+        max_per_ip: int = 0,
+        handshake_rate: float = 0.0,
+        handshake_burst: int = 0,
+    ) -> None:
+        self.max_connections = max_connections
+        self.max_per_ip = max_per_ip
+        self.handshakes: Optional[TokenBucket] = None
+        if handshake_rate > 0:
+            self.handshakes = TokenBucket(handshake_rate, max(handshake_burst, 1))
+        self.active = 0
+        # Set during shutdown; every new handshake is refused from then on.
+        self.draining = False
+        self._per_ip: Dict[str, int] = {}
+
+    def admit(self, ip: str) -> Optional[str]:
+        """Register a new connection, or return why it is refused.
+
+        An admitted connection must be given back with ``release``.
+        """
+        if self.draining:
+            return self._reject("shutting down")
+        if self.max_connections and self.active >= self.max_connections:
+            return self._reject("server full")
+        count = self._per_ip.get(ip, 0)
+        if self.max_per_ip and count >= self.max_per_ip:
+            return self._reject("too many connections")
+        if self.handshakes is not None and not self.handshakes.take():
+            return self._reject("rate limited")
+        self.active += 1
+        self._per_ip[ip] = count + 1
+        return None
+
+    def release(self, ip: str) -> None:
+        self.active -= 1
+        count = self._per_ip[ip] - 1
+        if count:
+            self._per_ip[ip] = count
+        else:
+            del self._per_ip[ip]
+
+    def _reject(self, reason: str) -> str:
+        metrics.REJECTED.inc()
+        return reason
@@ -0,0 +1,147 @@
+"""Derived topics carrying windowed aggregates of a source topic.
+
+Subscribing to ``<source>@<period>`` (for example ``sensors@100ms``,
+``sensors@2s`` or ``sensors@10hz``) starts an aggregator on ``sensors``.
+Every period it publishes one frame per key seen in the window, with
+``min``, ``max``, ``mean``, ``last`` and ``count`` of the samples. A sample
+is a numeric message or an object with a numeric ``value``. The aggregator
+stops when the derived topic has no subscribers left.
+"""
+import re
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+from .broker import Broker
+from .frame import Frame
+from .subscription import Subscription
+from .timerwheel import TimerWheel
+
+_DERIVED = re.compile(r"^(?P<source>.+)@(?P<amount>\d+(?:\.\d+)?)(?P<unit>ms|s|hz)$")
+
+
+def parse_derived(name: str) -> Optional[Tuple[str, float]]:
+    """Split a derived topic name into its source topic and period in seconds."""
+    match = _DERIVED.match(name)
+    if match is None:
+        return None
+    amount = float(match["amount"])
+    if amount <= 0:
+        return None
+    unit = match["unit"]
+    period = amount / 1000 if unit == "ms" else amount if unit == "s" else 1 / amount
+    return match["source"], period
+
+
+class Window:
+    __slots__ = ("min", "max", "sum", "count", "last")
+
+    def __init__(self, value: float) -> None:
+        self.min = value
+        self.max = value
+        self.sum = value
+        self.count = 1
+        self.last = value
+
+    def add(self, value: float) -> None:
+        if value < self.min:
+            self.min = value
+        elif value > self.max:
+            self.max = value
+        self.sum += value
+        self.count += 1
+        self.last = value
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "min": self.min,
+            "max": self.max,
+            "mean": self.sum / self.count,
+            "last": self.last,
+            "count": self.count,
+        }
+
+
+class Aggregator:
+    """Subscribes to a source topic and folds each sample into its key's window."""
+
+    def __init__(
+        self,
+        name: str,
+        source: str,
+        period: float,
+        broker: Broker,
+        wheel: TimerWheel,
+        on_stop: Optional[Callable[['Aggregator'], None]] = None,
+    ) -> None:
+        self.name = name
+        self.source = source
+        self.period = period
+        self.broker = broker
+        self.wheel = wheel
+        self.subscriptions: Dict[str, Subscription] = {}
+        self.closed = False
+        self.on_stop = on_stop
+        self._windows: Dict[Hashable, Window] = {}
+
+    def start(self) -> None:
+        self.broker.subscribe(self.source, self)
+        self.wheel.schedule(self.period, self._flush)
+
+    def stop(self) -> None:
+        self.closed = True
+        self._windows = {}
+        self.broker.unsubscribe_all(self)
+        if self.on_stop is not None:
+            self.on_stop(self)
+
+    def enqueue(self, frame: Frame, subscription: Optional[Subscription] = None) -> bool:
+        value = frame.data
+        if isinstance(value, dict):
+            value = value.get("value")
+        if not isinstance(value, (int, float)) or isinstance(value, bool):
+            return False
+        window = self._windows.get(frame.key)
+        if window is None:
+            self._windows[frame.key] = Window(value)
+        else:
+            window.add(value)
+        return True
+
+    def _flush(self) -> None:
+        if self.closed:
+            return
+        if self.broker.subscriber_count(self.name) == 0:
+            self.stop()
+            return
+        windows, self._windows = self._windows, {}
+        for key, window in windows.items():
+            # Local delivery only: every worker aggregates the full source
+            # stream itself, so relaying would double-count.
+            self.broker.deliver(Frame(self.name, window.summary(), key))
+        self.wheel.schedule(self.period, self._flush)
+
+
+class DerivedTopics:
+    """Starts aggregators on demand for derived topic names."""
+
+    def __init__(self, broker: Broker, wheel: TimerWheel) -> None:
+        self.broker = broker
+        self.wheel = wheel
+        self._aggregators: Dict[str, Aggregator] = {}
+
+    def ensure(self, name: str) -> None:
+        if name in self._aggregators:
+            return
+        parsed = parse_derived(name)
+        if parsed is None:
+            return
+        source, period = parsed
+        aggregator = Aggregator(
+            name, source, max(period, self.wheel.tick), self.broker, self.wheel, on_stop=self._forget
+        )
+        self._aggregators[name] = aggregator
+        aggregator.start()
+
+    def _forget(self, aggregator: Aggregator) -> None:
+        # Derived names come from clients, so stopped aggregators must not pile up.
+        if self._aggregators.get(aggregator.name) is aggregator:
+            del self._aggregators[aggregator.name]
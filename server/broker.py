@@ -0,0 +1,228 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Set
+
+from .connection import Connection
+from .frame import Frame
+from .subscription import Subscription
+from .topic import ReplayBuffer, Topic
+
+log = logging.getLogger(__name__)
+
+
+class Broker:
+    """In-process topic broker.
+
+    Subscribers are indexed by topic, so a publish only touches the
+    connections subscribed to that topic. Publishing never waits on a
+    socket: the frame is encoded once and queued on each subscriber.
+
+    Every frame is stamped with a per-topic sequence number, and the last
+    ``replay_size`` frames (optionally no older than ``replay_age`` seconds)
+    are kept so a reconnecting client can subscribe with ``since`` and get
+    only what it missed. With a WorkerBus attached the numbering is per
+    worker, so such a subscribe is answered with a gap instead.
+
+    History outlives a topic's last subscriber, but only for the
+    ``max_idle_topics`` most recently active such topics, and no longer than
+    ``replay_age`` when that is set; older idle topics are forgotten.
+    """
+
+    def __init__(
+        self, replay_size: int = 0, replay_age: Optional[float] = None, max_idle_topics: int = 1024
+    ) -> None:
+        self._topics: Dict[str, Topic] = {}
+        self.replay_size = replay_size
+        self.replay_age = replay_age
+        self.max_idle_topics = max_idle_topics
+        # Topics with history but no subscribers -> monotonic time of their
+        # last activity, oldest first.
+        self._idle: 'OrderedDict[str, float]' = OrderedDict()
+        self.connections: Set[Connection] = set()
+        # Set by a WorkerBus to forward local publishes to sibling processes.
+        self.relay: Optional[Callable[[Frame], None]] = None
+
+    def attach(self, connection: Connection) -> None:
+        self.connections.add(connection)
+        connection.start()
+
+    def detach(self, connection: Connection) -> None:
+        self.unsubscribe_all(connection)
+        self.connections.discard(connection)
+        connection.stop()
+
+    def _topic(self, name: str) -> Topic:
+        topic = self._topics.get(name)
+        if topic is None:
+            history = None
+            if self.replay_size > 0:
+                history = ReplayBuffer(self.replay_size, self.replay_age)
+            topic = self._topics[name] = Topic(name, history)
+        return topic
+
+    def subscribe(
+        self,
+        topic: str,
+        connection: Connection,
+        since: Optional[int] = None,
+        conflate: bool = False,
+        predicate: Optional[Callable[[Frame], bool]] = None,
+        channel: Optional[int] = None,
+        delta: bool = False,
+    ) -> Subscription:
+        subscription = Subscription(
+            connection, topic, channel=channel, conflate=conflate, predicate=predicate, delta=delta
+        )
+        # Subscribing again on the same topic (or channel) replaces the old one.
+        previous = connection.subscriptions.get(subscription.key)
+        if previous is not None:
+            self._remove(previous)
+        entry = self._topic(topic)
+        self._idle.pop(topic, None)
+        if delta:
+            entry.deltas += 1
+            if entry.states is None:
+                entry.states = {}
+        if since is not None:
+            # Replay and subscription happen in the same step, so nothing
+            # published in between can be missed or duplicated.
+            self._replay(entry, subscription, since)
+        elif delta:
+            self._send_states(entry, subscription)
+        entry.subscribers.add(subscription)
+        connection.subscriptions[subscription.key] = subscription
+        return subscription
+
+    def _replay(self, topic: Topic, subscription: Subscription, since: int) -> None:
+        connection = subscription.connection
+        if self.relay is not None:
+            # Every worker numbers a topic's frames on its own, and a
+            # reconnect can land on any of them, so a client's seq says
+            # nothing about this worker's history.
+            frames, complete = [], False
+        elif topic.history is None:
+            frames, complete = [], since >= topic.seq
+        else:
+            frames, complete = topic.history.since(since)
+        if since > topic.seq:
+            # The client saw a previous incarnation of an evicted topic.
+            complete = False
+        if not complete:
+            gap = {"topic": topic.name, "event": "gap", "since": since, "seq": topic.seq}
+            if subscription.channel is not None:
+                gap["channel"] = subscription.channel
+            connection.enqueue(Frame.reply(gap))
+        for frame in frames:
+            if subscription.accepts(frame):
+                connection.enqueue(frame, subscription)
+
+    def _send_states(self, topic: Topic, subscription: Subscription) -> None:
+        for frame in topic.states.values():
+            if subscription.accepts(frame):
+                subscription.connection.enqueue(frame, subscription)
+
+    def resync(self, key: Hashable, connection: Connection) -> bool:
+        """Resend the current state of a delta subscription's topic in full."""
+        subscription = connection.subscriptions.get(key)
+        if subscription is None or not subscription.delta:
+            return False
+        subscription.synced.clear()
+        self._send_states(self._topic(subscription.topic), subscription)
+        return True
+
+    def unsubscribe(self, key: Hashable, connection: Connection) -> None:
+        """Drop a subscription by topic, or by channel id if it was made on one."""
+        subscription = connection.subscriptions.pop(key, None)
+        if subscription is not None:
+            self._remove(subscription)
+
+    def _remove(self, subscription: Subscription) -> None:
+        entry = self._topics.get(subscription.topic)
+        if entry is None:
+            return
+        entry.subscribers.discard(subscription)
+        if subscription.delta:
+            entry.deltas -= 1
+            if not entry.deltas:
+                # Diffing every publish is only worth it for delta subscribers.
+                entry.states = None
+        if not entry.subscribers:
+            if entry.history is None:
+                del self._topics[subscription.topic]
+            else:
+                self._mark_idle(entry.name)
+
+    def _mark_idle(self, name: str) -> None:
+        idle = self._idle
+        now = time.monotonic()
+        idle[name] = now
+        idle.move_to_end(name)
+        expired = None if self.replay_age is None else now - self.replay_age
+        while idle:
+            name, last = next(iter(idle.items()))
+            if len(idle) <= self.max_idle_topics and (expired is None or last >= expired):
+                break
+            del idle[name]
+            del self._topics[name]
+
+    def unsubscribe_all(self, connection: Connection) -> None:
+        for key in list(connection.subscriptions):
+            self.unsubscribe(key, connection)
+
+    def last_seq(self, topic: str) -> int:
+        entry = self._topics.get(topic)
+        return entry.seq if entry is not None else 0
+
+    def subscriber_count(self, topic: str) -> int:
+        entry = self._topics.get(topic)
+        return len(entry.subscribers) if entry is not None else 0
+
+    def publish(self, topic: str, data: Any, key: Optional[Hashable] = None) -> int:
+        frame = Frame(topic, data, key)
+        delivered = self.deliver(frame)
+        if self.relay is not None:
+            self.relay(frame)
+        return delivered
+
+    def deliver(self, frame: Frame) -> int:
+        """Stamp a frame and queue it on this process's subscribers only."""
+        if self.replay_size > 0:
+            topic = self._topic(frame.topic)
+        else:
+            topic = self._topics.get(frame.topic)
+            if topic is None:
+                return 0
+        topic.stamp(frame)
+        if not topic.subscribers and topic.history is not None:
+            self._mark_idle(topic.name)
+        delivered = 0
+        for subscription in topic.subscribers:
+            if subscription.predicate is not None and not subscription.predicate(frame):
+                continue
+            delivered += subscription.connection.enqueue(frame, subscription)
+        return delivered
+
+    async def drain(self, timeout: float, reason: Callable[[], str]) -> None:
+        """Flush every connection's queue, within ``timeout`` seconds, and close it with 1001.
+
+        ``reason`` is called once per connection, so each client can be given
+        its own close reason.
+        """
+        connections = [c for c in self.connections if not c.closed]
+        if connections:
+            log.info(f"Draining {len(connections)} /ps connections")
+            await asyncio.gather(*(c.drain(timeout, 1001, reason()) for c in connections))
+
+    def stats(self) -> Dict[str, Any]:
+        depths = [c.queue_depth for c in self.connections]
+        return {
+            "connections": len(self.connections),
+            "topics": len(self._topics),
+            "queued": sum(depths),
+            "max_queue_depth": max(depths, default=0),
+            "sent": sum(c.sent for c in self.connections),
+            "dropped": sum(c.dropped for c in self.connections),
+            "conflated": sum(c.conflated for c in self.connections),
+        }
@@ -0,0 +1,113 @@
+import asyncio
+import glob
+import logging
+import os
+import socket
+from typing import Optional, Set
+
+from .broker import Broker
+from .frame import Frame
+
+log = logging.getLogger(__name__)
+
+# Unix datagrams larger than the socket buffer are rejected by the kernel.
+SOCKET_BUFFER_SIZE = 4 * 1024 * 1024
+
+
+class WorkerBus:
+    """Shares published frames between uvicorn workers on the same host.
+
+    Every worker binds a Unix datagram socket in a common directory and sends
+    each local publish, already encoded, to every other socket it finds there.
+    Frames received from siblings are delivered to local subscribers only, so
+    nothing is forwarded twice. Delivery is best effort: a peer whose receive
+    queue is full misses the frame and ``dropped`` is incremented.
+
+    Each worker stamps its own sequence numbers on what it delivers, so
+    replay with ``since`` is not offered while the bus is running.
+    """
+
+    def __init__(self, directory: str, broker: Broker, refresh_interval: float = 1.0) -> None:
+        self.directory = directory
+        self.broker = broker
+        self.refresh_interval = refresh_interval
+        self.path = os.path.join(directory, f"worker-{os.getpid()}.sock")
+        self.peers: Set[str] = set()
+        self.sent = 0
+        self.received = 0
+        self.dropped = 0
+        self._sock: Optional[socket.socket] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._refresh_handle: Optional[asyncio.TimerHandle] = None
+
+    def start(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SOCKET_BUFFER_SIZE)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_BUFFER_SIZE)
+        sock.bind(self.path)
+        sock.setblocking(False)
+        self._sock = sock
+        self._loop = asyncio.get_running_loop()
+        self._loop.add_reader(sock.fileno(), self._on_readable)
+        self._refresh()
+        self.broker.relay = self.send
+        log.info(f"Worker bus listening on {self.path}")
+
+    def close(self) -> None:
+        if self.broker.relay == self.send:
+            self.broker.relay = None
+        if self._refresh_handle is not None:
+            self._refresh_handle.cancel()
+        if self._sock is not None:
+            self._loop.remove_reader(self._sock.fileno())
+            self._sock.close()
+            self._sock = None
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+    def _refresh(self) -> None:
+        found = set(glob.glob(os.path.join(self.directory, "worker-*.sock")))
+        found.discard(self.path)
+        self.peers = found
+        self._refresh_handle = self._loop.call_later(self.refresh_interval, self._refresh)
+
+    def send(self, frame: Frame) -> None:
+        if not self.peers:
+            return
+        data = frame.text.encode()
+        for peer in list(self.peers):
+            try:
+                self._sock.sendto(data, peer)
+                self.sent += 1
+            except BlockingIOError:
+                self.dropped += 1
+            except (ConnectionRefusedError, FileNotFoundError):
+                # The worker behind this socket has exited.
+                self.peers.discard(peer)
+                try:
+                    os.unlink(peer)
+                except OSError:
+                    pass
+            except OSError as e:
+                self.dropped += 1
+                log.warning(f"Worker bus send to {peer} failed: {e}")
+
+    def _on_readable(self) -> None:
+        sock = self._sock
+        while sock is not None:
+            try:
+                data = sock.recv(SOCKET_BUFFER_SIZE)
+            except BlockingIOError:
+                return
+            self.received += 1
+            try:
+                frame = Frame.from_text(data.decode())
+            except ValueError as e:
+                log.warning(f"Discarding malformed worker bus frame: {e}")
+                continue
+            self.broker.deliver(frame)
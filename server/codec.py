@@ -0,0 +1,178 @@
+"""Compact binary encoding for the ``ps.binary.v1`` WebSocket subprotocol.
+
+Every value is prefixed with a one-byte type tag. Lists made up entirely of
+floats are packed as raw little-endian float64 arrays, which is what most
+telemetry payloads are. All lengths and counts are little-endian uint32.
+Frames for a multiplexed channel are one CHANNEL tag and uint32 channel id
+followed by the frame's value.
+"""
+import struct
+from array import array
+from typing import Any, List, Tuple
+
+SUBPROTOCOL = "ps.binary.v1"
+
+NONE = 0x00
+FALSE = 0x01
+TRUE = 0x02
+INT = 0x03
+FLOAT = 0x04
+STR = 0x05
+BYTES = 0x06
+LIST = 0x07
+DICT = 0x08
+FLOAT_ARRAY = 0x09
+BATCH = 0x10
+CHANNEL = 0x11
+
+_TAG = struct.Struct("<B")
+_LEN = struct.Struct("<I")
+_TAG_LEN = struct.Struct("<BI")
+_TAG_INT = struct.Struct("<Bq")
+_TAG_FLOAT = struct.Struct("<Bd")
+
+_INT_MIN = -(1 << 63)
+_INT_MAX = (1 << 63) - 1
+
+# Nesting allowed when decoding, so hostile input cannot exhaust the stack.
+MAX_DEPTH = 64
+
+
+class CodecError(ValueError):
+    """Raised for values that cannot be encoded or bytes that cannot be decoded."""
+
+
+def encode(value: Any) -> bytes:
+    out = bytearray()
+    try:
+        _encode(value, out)
+    except RecursionError:
+        raise CodecError("Value nested too deeply") from None
+    return bytes(out)
+
+
+def encode_batch(payloads: List[bytes]) -> bytes:
+    """Concatenate already-encoded values into one length-prefixed batch."""
+    out = bytearray(_TAG_LEN.pack(BATCH, len(payloads)))
+    for payload in payloads:
+        out += _LEN.pack(len(payload))
+        out += payload
+    return bytes(out)
+
+
+def encode_channel(channel: int, payload: bytes) -> bytes:
+    """Prefix an already-encoded value with the multiplexing channel it belongs to."""
+    return _TAG_LEN.pack(CHANNEL, channel) + payload
+
+
+def decode(data: bytes) -> Any:
+    view = memoryview(data)
+    try:
+        value, offset = _decode(view, 0, 0)
+    except (struct.error, IndexError, UnicodeDecodeError) as e:
+        raise CodecError(f"Malformed frame: {e}") from e
+    if offset != len(view):
+        raise CodecError(f"{len(view) - offset} trailing bytes")
+    return value
+
+
+def _encode(value: Any, out: bytearray) -> None:
+    kind = type(value)
+    if value is None:
+        out += _TAG.pack(NONE)
+    elif kind is bool:
+        out += _TAG.pack(TRUE if value else FALSE)
+    elif kind is int:
+        if not _INT_MIN <= value <= _INT_MAX:
+            raise CodecError(f"Integer out of int64 range: {value}")
+        out += _TAG_INT.pack(INT, value)
+    elif kind is float:
+        out += _TAG_FLOAT.pack(FLOAT, value)
+    elif kind is str:
+        raw = value.encode()
+        out += _TAG_LEN.pack(STR, len(raw))
+        out += raw
+    elif kind is bytes or kind is bytearray:
+        out += _TAG_LEN.pack(BYTES, len(value))
+        out += value
+    elif kind is list or kind is tuple:
+        if value and all(type(v) is float for v in value):
+            out += _TAG_LEN.pack(FLOAT_ARRAY, len(value))
+            out += array("d", value).tobytes()
+        else:
+            out += _TAG_LEN.pack(LIST, len(value))
+            for item in value:
+                _encode(item, out)
+    elif kind is dict:
+        out += _TAG_LEN.pack(DICT, len(value))
+        for key, item in value.items():
+            if type(key) is not str:
+                raise CodecError(f"Dict keys must be str, not {type(key).__name__}")
+            raw = key.encode()
+            out += _LEN.pack(len(raw))
+            out += raw
+            _encode(item, out)
+    else:
+        raise CodecError(f"Cannot encode {kind.__name__}")
+
+
+def _decode(view: memoryview, offset: int, depth: int) -> Tuple[Any, int]:
+    if depth > MAX_DEPTH:
+        raise CodecError(f"Nested deeper than {MAX_DEPTH} levels")
+    tag = view[offset]
+    offset += 1
+    if tag == NONE:
+        return None, offset
+    if tag == FALSE:
+        return False, offset
+    if tag == TRUE:
+        return True, offset
+    if tag == INT:
+        return struct.unpack_from("<q", view, offset)[0], offset + 8
+    if tag == FLOAT:
+        return struct.unpack_from("<d", view, offset)[0], offset + 8
+    (length,) = _LEN.unpack_from(view, offset)
+    offset += 4
+    if tag == STR or tag == BYTES:
+        end = offset + length
+        if end > len(view):
+            raise CodecError("Truncated string")
+        raw = bytes(view[offset:end])
+        return (raw.decode() if tag == STR else raw), end
+    if tag == FLOAT_ARRAY:
+        end = offset + 8 * length
+        if end > len(view):
+            raise CodecError("Truncated float array")
+        values = array("d")
+        values.frombytes(view[offset:end])
+        return values.tolist(), end
+    if tag == LIST:
+        items = []
+        for _ in range(length):
+            item, offset = _decode(view, offset, depth + 1)
+            items.append(item)
+        return items, offset
+    if tag == DICT:
+        result = {}
+        for _ in range(length):
+            (size,) = _LEN.unpack_from(view, offset)
+            offset += 4
+            key = bytes(view[offset:offset + size]).decode()
+            offset += size
+            result[key], offset = _decode(view, offset, depth + 1)
+        return result, offset
+    if tag == CHANNEL:
+        value, offset = _decode(view, offset, depth + 1)
+        return {"channel": length, "frame": value}, offset
+    if tag == BATCH:
+        items = []
+        for _ in range(length):
+            (size,) = _LEN.unpack_from(view, offset)
+            offset += 4
+            item, end = _decode(view, offset, depth + 1)
+            if end != offset + size:
+                raise CodecError("Batch entry length mismatch")
+            items.append(item)
+            offset = end
+        return items, offset
+    raise CodecError(f"Unknown type tag 0x{tag:02x}")
@@ -0,0 +1,311 @@
+import asyncio
+import itertools
+import logging
+import time
+from collections import OrderedDict
+from enum import Enum
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from fastapi import WebSocket
+
+from . import metrics
+from .codec import CodecError
+from .delta import StateFrame
+from .frame import ChannelFrame, Frame, batch_binary, batch_text
+from .subscription import Subscription
+
+log = logging.getLogger(__name__)
+
+
+class OverflowPolicy(str, Enum):
+    """What a connection does when its outbound queue is full."""
+
+    DROP_OLDEST = "drop-oldest"
+    DROP_NEWEST = "drop-newest"
+    CONFLATE = "conflate"
+    DISCONNECT = "disconnect"
+
+
+class Connection:
+    """A client attached to the /ps endpoint.
+
+    Outbound frames go through a bounded queue drained by a dedicated writer
+    task, so neither publishers nor the client's own receive loop ever wait
+    on a slow socket.
+
+    With a non-zero ``batch_window`` the writer holds frames for up to that
+    many seconds, or until ``batch_bytes`` are pending, and sends them as a
+    single JSON array frame, or a length-prefixed batch in binary mode.
+
+    Binary connections (the ``ps.binary.v1`` subprotocol) get each frame's
+    codec encoding instead of its JSON text.
+
+    Frames for subscriptions made on a channel carry that channel's id as a
+    prefix, so one socket can serve many independent consumers.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        max_queue: int = 1024,
+        overflow: OverflowPolicy = OverflowPolicy.DROP_OLDEST,
+        send_timeout: float = 5.0,
+        batch_window: float = 0.0,
+        batch_bytes: int = 64 * 1024,
+        binary: bool = False,
+    ) -> None:
+        self.websocket = websocket
+        # Keyed by topic, or by channel id for channel subscriptions.
+        self.subscriptions: Dict[Hashable, Subscription] = {}
+        self.max_queue = max_queue
+        self.overflow = overflow
+        self.send_timeout = send_timeout
+        self.batch_window = batch_window
+        self.batch_bytes = batch_bytes
+        self.binary = binary
+        self.sent = 0
+        self.dropped = 0
+        self.conflated = 0
+        self.closed = False
+        # Monotonic time of the last inbound message, for idle detection.
+        self.last_seen = 0.0
+        self._pending: 'OrderedDict[int, Frame]' = OrderedDict()
+        self._ids = itertools.count()
+        # (channel, topic, key) -> slot of the newest pending frame with that key, so
+        # conflation can overwrite it in place and keep its queue position.
+        self._keyed: Dict[Hashable, int] = {}
+        self._ready = asyncio.Event()
+        # Set by the writer whenever it has nothing left to send.
+        self._idle = asyncio.Event()
+        # Only maintained in batching mode; a hint for flushing a window early.
+        self._pending_bytes = 0
+        self._batch_full = asyncio.Event()
+        self._writer: Optional[asyncio.Task] = None
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._pending)
+
+    def start(self) -> None:
+        self._writer = asyncio.ensure_future(self._write_loop())
+
+    def stop(self) -> None:
+        self.closed = True
+        if self._writer is not None:
+            self._writer.cancel()
+            self._writer = None
+
+    def send_text(self, text: str) -> bool:
+        return self.enqueue(Frame.raw_text(text))
+
+    def enqueue(self, frame: Frame, subscription: Optional[Subscription] = None) -> bool:
+        """Queue a frame for the writer; returns False if it was not accepted.
+
+        If the frame is delivered for a conflating ``subscription``, a pending
+        frame with the same topic and key is replaced rather than queued
+        behind, so a slow client only ever holds the latest value per key.
+        """
+        if self.closed:
+            return False
+        if self.binary and not self._encodable(frame):
+            return False
+        conflate = False
+        if subscription is not None:
+            conflate = subscription.conflate
+            if subscription.synced is not None:
+                # Patch or full frame is decided when it is actually sent.
+                frame = StateFrame(frame, subscription)
+            elif subscription.channel is not None:
+                frame = ChannelFrame(frame, subscription.channel)
+        pending = self._pending
+        if conflate:
+            slot = self._keyed.get((frame.channel, frame.topic, frame.key))
+            if slot is not None:
+                pending[slot] = frame
+                self.conflated += 1
+                return True
+        if len(pending) >= self.max_queue and not self._make_room(frame):
+            return False
+        slot = next(self._ids)
+        pending[slot] = frame
+        if conflate or (frame.key is not None and self.overflow is OverflowPolicy.CONFLATE):
+            self._keyed[(frame.channel, frame.topic, frame.key)] = slot
+        if self.batch_window:
+            self._pending_bytes += self._size(frame)
+            if self._pending_bytes >= self.batch_bytes:
+                self._batch_full.set()
+        self._ready.set()
+        return True
+
+    def _encodable(self, frame: Frame) -> bool:
+        # JSON allows values the codec does not, e.g. integers beyond int64.
+        # Checked on the shared frame, whose encoding is cached for the
+        # other binary recipients.
+        try:
+            frame.binary
+        except CodecError as e:
+            log.debug(f"Skipping frame on {frame.topic!r} for binary client: {e}")
+            metrics.UNENCODABLE.inc()
+            return False
+        return True
+
+    def _make_room(self, frame: Frame) -> bool:
+        policy = self.overflow
+        if policy is OverflowPolicy.CONFLATE and frame.key is not None:
+            slot = self._keyed.get((frame.channel, frame.topic, frame.key))
+            if slot is not None:
+                # Overwrite the stale value in place; the queue does not grow.
+                self._pending[slot] = frame
+                self._drop(1)
+                self._ready.set()
+                return False
+        if policy is OverflowPolicy.DROP_NEWEST:
+            self._drop(1)
+            return False
+        if policy is OverflowPolicy.DISCONNECT:
+            self._drop(len(self._pending) + 1)
+            self.abort(code=1008)
+            return False
+        self._pop()
+        self._drop(1)
+        return True
+
+    def _drop(self, count: int) -> None:
+        self.dropped += count
+        metrics.DROPPED.inc(count)
+
+    def _pop(self) -> Frame:
+        slot, frame = self._pending.popitem(last=False)
+        if self._keyed:
+            key = (frame.channel, frame.topic, frame.key)
+            if self._keyed.get(key) == slot:
+                del self._keyed[key]
+        return frame
+
+    async def _write_loop(self) -> None:
+        pending = self._pending
+        while not self.closed:
+            if not pending:
+                self._ready.clear()
+                self._idle.set()
+                await self._ready.wait()
+                continue
+            try:
+                if self.batch_window:
+                    await self._fill_window()
+                    while pending and not self.closed:
+                        if not await self._send(*self._next_batch()):
+                            return
+                    self._pending_bytes = 0
+                    self._batch_full.clear()
+                elif not await self._send(self._message(self._take())):
+                    return
+            except (TypeError, ValueError):
+                # A frame that cannot be encoded would otherwise end the
+                # writer silently and leave the socket open but mute.
+                log.exception("Closing /ps connection after an encoding error")
+                self.abort(code=1011)
+                return
+
+    async def _fill_window(self) -> None:
+        if self._batch_full.is_set():
+            return
+        try:
+            async with asyncio.timeout(self.batch_window):
+                await self._batch_full.wait()
+        except TimeoutError:
+            pass
+
+    def _size(self, frame: Frame) -> int:
+        return len(frame.binary) if self.binary else len(frame.text)
+
+    def _message(self, frame: Frame) -> Dict[str, Any]:
+        return frame.binary_message if self.binary else frame.message
+
+    def _take(self) -> Frame:
+        """Pop the next frame to send, resolving delta frames against what was sent."""
+        frame = self._pop()
+        if type(frame) is StateFrame:
+            return frame.resolve()
+        return frame
+
+    def _next_batch(self) -> Tuple[Dict[str, Any], int]:
+        frames = [self._take()]
+        size = self._size(frames[0])
+        while self._pending and size < self.batch_bytes:
+            frame = self._take()
+            frames.append(frame)
+            size += self._size(frame)
+        if len(frames) == 1:
+            return self._message(frames[0]), 1
+        if self.binary:
+            return {"type": "websocket.send", "bytes": batch_binary(frames)}, len(frames)
+        return {"type": "websocket.send", "text": batch_text(frames)}, len(frames)
+
+    async def _send(self, message: Dict[str, Any], frames: int = 1) -> bool:
+        started = time.perf_counter()
+        try:
+            async with asyncio.timeout(self.send_timeout):
+                await self.websocket.send(message)
+        except TimeoutError:
+            log.debug("Closing slow /ps consumer")
+            self.abort(code=1008)
+            return False
+        except Exception:
+            self.closed = True
+            return False
+        metrics.SEND_SECONDS.observe(time.perf_counter() - started)
+        text = message.get("text")
+        metrics.BYTES_OUT.inc(len(message["bytes"]) if text is None else metrics.utf8_len(text))
+        metrics.MESSAGES_OUT.inc(frames)
+        self.sent += frames
+        return True
+
+    def abort(self, code: int) -> None:
+        """Discard anything still queued and close the socket in the background."""
+        if self.closed:
+            return
+        self.closed = True
+        self._pending.clear()
+        self._keyed.clear()
+        asyncio.ensure_future(self._close_socket(code))
+
+    async def close(self, code: int = 1000, reason: str = "") -> None:
+        if self.closed:
+            return
+        self.closed = True
+        await self._close_socket(code, reason)
+
+    async def drain(self, timeout: float, code: int = 1001, reason: str = "") -> None:
+        """Give the writer up to ``timeout`` seconds to send what is queued, then close."""
+        if self.closed:
+            return
+        if self._writer is not None:
+            # Wake the writer so it reports idle once the queue is empty and
+            # any send in flight has finished.
+            self._idle.clear()
+            self._ready.set()
+            try:
+                async with asyncio.timeout(timeout):
+                    await self._idle.wait()
+            except TimeoutError:
+                log.debug(f"Closing /ps connection with {len(self._pending)} frames unsent")
+        await self.close(code, reason)
+
+    async def _close_socket(self, code: int, reason: str = "") -> None:
+        try:
+            await self.websocket.close(code=code, reason=reason)
+        except Exception:
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queue_depth": len(self._pending),
+            "max_queue": self.max_queue,
+            "overflow": self.overflow.value,
+            "batch_window": self.batch_window,
+            "binary": self.binary,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "conflated": self.conflated,
+        }
@@ -0,0 +1,123 @@
+"""Delta encoding for topics that carry full state objects.
+
+A subscription made with ``"delta": true`` receives the full message the
+first time it sees a key, and afterwards a patch frame whenever the client
+is known to hold the previous state of that key:
+
+    {"topic": "devices", "seq": 42, "key": "d7", "base": 41,
+     "patch": [{"op": "replace", "path": "/temp", "value": 21.5}]}
+
+``base`` is the seq of the state the patch applies to; ``patch`` uses the
+"add", "remove" and "replace" operations of JSON Patch (RFC 6902). The patch
+is computed once per update, when the frame is stamped, and shared by every
+in-sync subscriber. Whether a connection gets the patch or the full frame is
+decided by its writer at send time from what it actually sent last, so
+dropped or conflated frames just lead to a full frame.
+"""
+from typing import Any, Dict, Hashable, List, Optional
+
+from . import metrics
+from .frame import ChannelFrame, Frame
+from .subscription import Subscription
+
+
+class PatchFrame(Frame):
+    """The difference between two consecutive states of one key."""
+
+    __slots__ = ("base",)
+
+    def __init__(self, source: Frame, base: int, ops: List[Dict[str, Any]]) -> None:
+        super().__init__(source.topic, ops, source.key)
+        self.seq = source.seq
+        self.base = base
+
+    def _payload(self) -> Any:
+        payload = {"topic": self.topic, "seq": self.seq, "base": self.base, "patch": self.data}
+        if self.key is not None:
+            payload["key"] = self.key
+        return payload
+
+
+def make_patch(previous: Frame, frame: Frame) -> Optional[PatchFrame]:
+    """A patch from ``previous`` to ``frame``, or None if it would not be smaller."""
+    ops: List[Dict[str, Any]] = []
+    _diff(previous.data, frame.data, "", ops)
+    patch = PatchFrame(frame, previous.seq, ops)
+    if len(patch.text) >= len(frame.text):
+        return None
+    return patch
+
+
+def _diff(old: Any, new: Any, path: str, ops: List[Dict[str, Any]]) -> None:
+    if type(old) is dict and type(new) is dict:
+        for name, value in old.items():
+            pointer = f"{path}/{_escape(name)}"
+            if name not in new:
+                ops.append({"op": "remove", "path": pointer})
+            elif value != new[name]:
+                _diff(value, new[name], pointer, ops)
+        for name, value in new.items():
+            if name not in old:
+                ops.append({"op": "add", "path": f"{path}/{_escape(name)}", "value": value})
+        return
+    if type(old) is list and type(new) is list and len(old) == len(new):
+        for index, (a, b) in enumerate(zip(old, new)):
+            if a != b:
+                _diff(a, b, f"{path}/{index}", ops)
+        return
+    # Scalars, type changes and lists that changed length are replaced whole.
+    # An empty path replaces the entire document.
+    ops.append({"op": "replace", "path": path, "value": new})
+
+
+def _escape(name: Any) -> str:
+    return str(name).replace("~", "~0").replace("/", "~1")
+
+
+class StateFrame:
+    """A frame queued for a delta subscription, resolved when the writer sends it.
+
+    Until then it stands in for the full frame, so queue accounting and
+    conflation treat it like any other frame.
+    """
+
+    __slots__ = ("frame", "subscription")
+
+    raw = False
+
+    def __init__(self, frame: Frame, subscription: Subscription) -> None:
+        self.frame = frame
+        self.subscription = subscription
+
+    @property
+    def topic(self) -> Optional[str]:
+        return self.frame.topic
+
+    @property
+    def key(self) -> Optional[Hashable]:
+        return self.frame.key
+
+    @property
+    def channel(self) -> Optional[int]:
+        return self.subscription.channel
+
+    @property
+    def text(self) -> str:
+        return self.frame.text
+
+    @property
+    def binary(self) -> bytes:
+        return self.frame.binary
+
+    def resolve(self) -> Frame:
+        """The patch if the client holds its base state, else the full frame."""
+        frame = self.frame
+        synced = self.subscription.synced
+        out = frame
+        if frame.patch is not None and synced.get(frame.key) == frame.patch.base:
+            out = frame.patch
+            metrics.PATCHES.inc()
+        synced[frame.key] = frame.seq
+        if self.subscription.channel is not None:
+            return ChannelFrame(out, self.subscription.channel)
+        return out
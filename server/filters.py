@@ -0,0 +1,133 @@
+"""Server-side subscription filters.
+
+A filter is a JSON object sent with a subscribe message and compiled once
+into a predicate over frames:
+
+    {"field": "status", "eq": "alarm"}             equality (also "ne", "in")
+    {"field": "reading.temp", "gte": 10, "lt": 40}  numeric range
+    {"key_prefix": "sensor/7"}                      prefix of the message key
+    {"field": "site", "prefix": "eu-"}              prefix of a string field
+    {"all": [...]} / {"any": [...]}                 combinations
+
+Dotted field paths index into the message data. A frame whose data lacks
+the field does not match.
+"""
+import operator
+from typing import Any, Callable, Dict, List
+
+from .frame import Frame
+
+Predicate = Callable[[Frame], bool]
+
+_MISSING = object()
+
+_COMPARISONS = {
+    "gt": operator.gt,
+    "gte": operator.ge,
+    "lt": operator.lt,
+    "lte": operator.le,
+}
+
+
+class FilterError(ValueError):
+    """Raised for filter specifications that cannot be compiled."""
+
+
+def compile_filter(spec: Any) -> Predicate:
+    if not isinstance(spec, dict) or not spec:
+        raise FilterError("Filter must be a non-empty object")
+    if "all" in spec or "any" in spec:
+        combinator = "all" if "all" in spec else "any"
+        parts = spec[combinator]
+        if not isinstance(parts, list) or not parts:
+            raise FilterError(f'"{combinator}" takes a non-empty list of filters')
+        predicates = [compile_filter(part) for part in parts]
+        if combinator == "all":
+            return lambda frame: all(p(frame) for p in predicates)
+        return lambda frame: any(p(frame) for p in predicates)
+    if "key_prefix" in spec:
+        prefix = spec["key_prefix"]
+        if not isinstance(prefix, str):
+            raise FilterError('"key_prefix" must be a string')
+        return lambda frame: isinstance(frame.key, str) and frame.key.startswith(prefix)
+    return _compile_field(spec)
+
+
+def _compile_field(spec: Dict[str, Any]) -> Predicate:
+    field = spec.get("field")
+    if not isinstance(field, str) or not field:
+        raise FilterError('Filter needs a "field", "key_prefix", "all" or "any"')
+    get = _getter(field.split("."))
+    checks: List[Callable[[Any], bool]] = []
+    for name, operand in spec.items():
+        if name == "field":
+            continue
+        if name == "eq":
+            checks.append(lambda value, operand=operand: value == operand)
+        elif name == "ne":
+            checks.append(lambda value, operand=operand: value != operand)
+        elif name == "in":
+            if not isinstance(operand, list):
+                raise FilterError('"in" takes a list')
+            choices = _choices(operand)
+            checks.append(lambda value: _hashable(value) and value in choices)
+        elif name in _COMPARISONS:
+            if not _is_number(operand):
+                raise FilterError(f'"{name}" takes a number')
+            compare = _COMPARISONS[name]
+            checks.append(
+                lambda value, compare=compare, operand=operand:
+                    _is_number(value) and compare(value, operand)
+            )
+        elif name == "prefix":
+            if not isinstance(operand, str):
+                raise FilterError('"prefix" takes a string')
+            checks.append(
+                lambda value, operand=operand: isinstance(value, str) and value.startswith(operand)
+            )
+        else:
+            raise FilterError(f"Unknown filter operator {name!r}")
+    if not checks:
+        raise FilterError(f"No condition given for field {field!r}")
+
+    if len(checks) == 1:
+        check = checks[0]
+
+        def predicate(frame: Frame) -> bool:
+            value = get(frame.data)
+            return value is not _MISSING and check(value)
+    else:
+        def predicate(frame: Frame) -> bool:
+            value = get(frame.data)
+            return value is not _MISSING and all(check(value) for check in checks)
+    return predicate
+
+
+def _getter(path: List[str]) -> Callable[[Any], Any]:
+    if len(path) == 1:
+        name = path[0]
+        return lambda data: data.get(name, _MISSING) if isinstance(data, dict) else _MISSING
+
+    def get(data: Any) -> Any:
+        for name in path:
+            if not isinstance(data, dict):
+                return _MISSING
+            data = data.get(name, _MISSING)
+            if data is _MISSING:
+                return _MISSING
+        return data
+    return get
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _hashable(value: Any) -> bool:
+    return not isinstance(value, (dict, list))
+
+
+def _choices(values: List[Any]) -> frozenset:
+    if not all(_hashable(v) for v in values):
+        raise FilterError('"in" takes a list of scalars')
+    return frozenset(values)
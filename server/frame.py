@@ -0,0 +1,164 @@
+import json
+from typing import Any, Dict, Hashable, List, Optional
+
+from . import codec
+
+
+class Frame:
+    """A published message, encoded at most once however many sockets it reaches."""
+
+    __slots__ = (
+        "topic", "data", "key", "seq", "raw", "patch",
+        "_text", "_message", "_binary", "_binary_message", "_sse",
+    )
+
+    # Frames go out on no channel unless wrapped in a ChannelFrame.
+    channel: Optional[int] = None
+
+    def __init__(self, topic: Optional[str], data: Any, key: Optional[Hashable] = None) -> None:
+        self.topic = topic
+        self.data = data
+        self.key = key
+        # Assigned by the broker when the frame is delivered on its topic.
+        self.seq: Optional[int] = None
+        self.raw = False
+        # Set when stamped on a topic that keeps state for delta subscribers.
+        self.patch: Optional['Frame'] = None
+        self._text: Optional[str] = None
+        self._message: Optional[Dict[str, Any]] = None
+        self._binary: Optional[bytes] = None
+        self._binary_message: Optional[Dict[str, Any]] = None
+        self._sse: Optional[bytes] = None
+
+    @classmethod
+    def raw_text(cls, text: str) -> 'Frame':
+        """A frame whose text is sent as-is, e.g. the chat echo."""
+        frame = cls(None, None)
+        frame.raw = True
+        frame._text = text
+        return frame
+
+    @classmethod
+    def reply(cls, payload: Dict[str, Any]) -> 'Frame':
+        """A protocol message for a single client, encoded like any other frame."""
+        return cls(None, payload)
+
+    @classmethod
+    def from_text(cls, text: str) -> 'Frame':
+        """Rebuild a frame received from another process.
+
+        The sequence number is not carried over: the receiving broker stamps
+        its own, so the frame is re-encoded there once.
+        """
+        payload = json.loads(text)
+        return cls(payload["topic"], payload.get("data"), payload.get("key"))
+
+    def _payload(self) -> Any:
+        if self.topic is None:
+            return self.data
+        payload = {"topic": self.topic, "seq": self.seq, "data": self.data}
+        if self.key is not None:
+            payload["key"] = self.key
+        return payload
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = json.dumps(self._payload())
+        return self._text
+
+    @property
+    def message(self) -> Dict[str, Any]:
+        # The ASGI send event is shared by every recipient; servers only read it.
+        if self._message is None:
+            self._message = {"type": "websocket.send", "text": self.text}
+        return self._message
+
+    @property
+    def binary(self) -> bytes:
+        if self._binary is None:
+            if self.raw:
+                self._binary = codec.encode(self._text)
+            else:
+                self._binary = codec.encode(self._payload())
+        return self._binary
+
+    @property
+    def binary_message(self) -> Dict[str, Any]:
+        if self._binary_message is None:
+            self._binary_message = {"type": "websocket.send", "bytes": self.binary}
+        return self._binary_message
+
+    @property
+    def sse(self) -> bytes:
+        """The frame as a Server-Sent Events record, with the sequence number as its id."""
+        if self._sse is None:
+            if self.seq is None:
+                self._sse = f"data: {self.text}\n\n".encode()
+            else:
+                self._sse = f"id: {self.seq}\ndata: {self.text}\n\n".encode()
+        return self._sse
+
+    @property
+    def batch_item(self) -> str:
+        """The frame as an element of a JSON array batch."""
+        return json.dumps(self._text) if self.raw else self.text
+
+
+class ChannelFrame:
+    """A shared frame on its way to one multiplexed channel of a connection.
+
+    Only the channel prefix is built per recipient: ``"<channel>|"`` before
+    the JSON text, or a CHANNEL tag in binary mode. The payload itself is
+    still the underlying frame's single encoding.
+    """
+
+    __slots__ = ("frame", "channel")
+
+    raw = False
+
+    def __init__(self, frame: Frame, channel: int) -> None:
+        self.frame = frame
+        self.channel = channel
+
+    @property
+    def topic(self) -> Optional[str]:
+        return self.frame.topic
+
+    @property
+    def key(self) -> Optional[Hashable]:
+        return self.frame.key
+
+    @property
+    def seq(self) -> Optional[int]:
+        return self.frame.seq
+
+    @property
+    def text(self) -> str:
+        return f"{self.channel}|{self.frame.text}"
+
+    @property
+    def message(self) -> Dict[str, Any]:
+        return {"type": "websocket.send", "text": self.text}
+
+    @property
+    def binary(self) -> bytes:
+        return codec.encode_channel(self.channel, self.frame.binary)
+
+    @property
+    def binary_message(self) -> Dict[str, Any]:
+        return {"type": "websocket.send", "bytes": self.binary}
+
+    @property
+    def batch_item(self) -> str:
+        # Inside a JSON batch the prefix becomes a [channel, frame] pair.
+        return f"[{self.channel},{self.frame.text}]"
+
+
+def batch_text(frames: List[Frame]) -> str:
+    """Join already-encoded frames into one JSON array without re-serialising them."""
+    return "[" + ",".join(f.batch_item for f in frames) + "]"
+
+
+def batch_binary(frames: List[Frame]) -> bytes:
+    return codec.encode_batch([f.binary for f in frames])
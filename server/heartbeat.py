@@ -0,0 +1,50 @@
+import logging
+import time
+
+from .connection import Connection
+from .frame import Frame
+from .timerwheel import TimerWheel
+
+log = logging.getLogger(__name__)
+
+# Shared by every connection, so it is encoded once for the life of the process.
+PING = Frame.reply({"event": "ping"})
+
+
+class Heartbeat:
+    """Pings quiet /ps clients and closes the ones that stay silent.
+
+    Each connection has at most one pending timer on the shared wheel. When
+    it fires, a connection that has sent something within ``interval`` is
+    simply rescheduled; otherwise it is pinged, and once it has been silent
+    for ``idle_timeout`` it is closed. Any inbound message counts as a pong.
+    An ``idle_timeout`` of 0 only pings and never closes.
+    """
+
+    def __init__(self, wheel: TimerWheel, interval: float, idle_timeout: float) -> None:
+        self.wheel = wheel
+        self.interval = interval
+        self.idle_timeout = idle_timeout
+        self.timeouts = 0
+
+    def watch(self, connection: Connection) -> None:
+        connection.last_seen = time.monotonic()
+        self.wheel.schedule(self.interval, self._check, connection)
+
+    def _check(self, connection: Connection) -> None:
+        if connection.closed:
+            return
+        idle = time.monotonic() - connection.last_seen
+        if self.idle_timeout and idle >= self.idle_timeout:
+            log.debug(f"Closing /ps connection idle for {idle:.1f}s")
+            self.timeouts += 1
+            connection.abort(code=1001)
+            return
+        if idle >= self.interval:
+            connection.enqueue(PING)
+            delay = self.interval
+            if self.idle_timeout:
+                delay = min(delay, self.idle_timeout - idle)
+        else:
+            delay = self.interval - idle
+        self.wheel.schedule(delay, self._check, connection)
@@ -0,0 +1,206 @@
+"""Process-wide counters and histograms, rendered in the Prometheus text format.
+
+Everything here is updated from the event loop thread only, so updates are
+plain attribute arithmetic with no locking. Histogram buckets are fixed at
+construction; observing a value is a bisect and two additions.
+"""
+import asyncio
+import time
+from bisect import bisect_left
+from typing import Callable, List, Optional, Sequence
+
+
+class Counter:
+    __slots__ = ("name", "help", "value")
+
+    def __init__(self, name: str, help: str) -> None:
+        self.name = name
+        self.help = help
+        self.value = 0
+
+    def inc(self, amount: int = 1) -> None:
+        self.value += amount
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.help}",
+            f"# TYPE {self.name} counter",
+            f"{self.name} {self.value}",
+        ]
+
+
+class Gauge:
+    __slots__ = ("name", "help", "value", "func")
+
+    def __init__(self, name: str, help: str, func: Optional[Callable[[], float]] = None) -> None:
+        self.name = name
+        self.help = help
+        self.value = 0.0
+        # Read at scrape time instead of being kept up to date.
+        self.func = func
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def render(self) -> List[str]:
+        value = self.func() if self.func is not None else self.value
+        return [
+            f"# HELP {self.name} {self.help}",
+            f"# TYPE {self.name} gauge",
+            f"{self.name} {value}",
+        ]
+
+
+class Rate(Gauge):
+    """Per-second rate of a counter, recomputed each time ``update`` is called."""
+
+    __slots__ = ("counter", "_last_value", "_last_time")
+
+    def __init__(self, name: str, help: str, counter: Counter) -> None:
+        super().__init__(name, help)
+        self.counter = counter
+        self._last_value = counter.value
+        self._last_time = time.monotonic()
+
+    def update(self, now: float) -> None:
+        elapsed = now - self._last_time
+        if elapsed > 0:
+            self.value = round((self.counter.value - self._last_value) / elapsed, 3)
+        self._last_value = self.counter.value
+        self._last_time = now
+
+
+class Histogram:
+    __slots__ = ("name", "help", "bounds", "counts", "sum", "count")
+
+    def __init__(self, name: str, help: str, bounds: Sequence[float]) -> None:
+        self.name = name
+        self.help = help
+        self.bounds = list(bounds)
+        # One slot per bound plus the +Inf bucket.
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        cumulative = 0
+        for bound, count in zip(self.bounds, self.counts):
+            cumulative += count
+            lines.append(f'{self.name}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f'{self.name}_bucket{{le="+Inf"}} {self.count}')
+        lines.append(f"{self.name}_sum {self.sum}")
+        lines.append(f"{self.name}_count {self.count}")
+        return lines
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: list = []
+
+    def counter(self, name: str, help: str) -> Counter:
+        return self._add(Counter(name, help))
+
+    def gauge(self, name: str, help: str, func: Optional[Callable[[], float]] = None) -> Gauge:
+        return self._add(Gauge(name, help, func))
+
+    def rate(self, name: str, help: str, counter: Counter) -> Rate:
+        return self._add(Rate(name, help, counter))
+
+    def histogram(self, name: str, help: str, bounds: Sequence[float]) -> Histogram:
+        return self._add(Histogram(name, help, bounds))
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def rates(self) -> List[Rate]:
+        return [m for m in self._metrics if isinstance(m, Rate)]
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+)
+
+REGISTRY = Registry()
+
+MESSAGES_IN = REGISTRY.counter("ps_messages_received_total", "Messages received from /ps clients.")
+MESSAGES_OUT = REGISTRY.counter("ps_messages_sent_total", "Frames delivered to /ps clients.")
+BYTES_IN = REGISTRY.counter("ps_bytes_received_total", "Payload bytes received from /ps clients.")
+BYTES_OUT = REGISTRY.counter("ps_bytes_sent_total", "Payload bytes sent to /ps clients.")
+PATCHES = REGISTRY.counter(
+    "ps_state_patches_sent_total", "State updates sent to delta subscribers as a patch."
+)
+DROPPED = REGISTRY.counter("ps_messages_dropped_total", "Frames discarded by an overflow policy.")
+UNENCODABLE = REGISTRY.counter(
+    "ps_frames_unencodable_total", "Frames skipped for a binary client because the codec cannot encode them."
+)
+THROTTLED = REGISTRY.counter(
+    "ps_messages_throttled_total", "Inbound /ps messages over a client's rate limit."
+)
+REJECTED = REGISTRY.counter(
+    "ps_connections_rejected_total", "/ps handshakes refused by admission control."
+)
+MESSAGES_IN_RATE = REGISTRY.rate(
+    "ps_messages_received_per_second", "Inbound message rate over the last sample interval.", MESSAGES_IN
+)
+MESSAGES_OUT_RATE = REGISTRY.rate(
+    "ps_messages_sent_per_second", "Outbound frame rate over the last sample interval.", MESSAGES_OUT
+)
+SEND_SECONDS = REGISTRY.histogram(
+    "ps_send_duration_seconds", "Time spent in each WebSocket send.", LATENCY_BUCKETS
+)
+LOOP_LAG_SECONDS = REGISTRY.histogram(
+    "ps_event_loop_lag_seconds", "How late the event loop ran a scheduled callback.", LATENCY_BUCKETS
+)
+
+
+def utf8_len(text: str) -> int:
+    """Size of ``text`` on the wire, without encoding it when it is ASCII.
+
+    JSON produced by the server always is, so only client text pays for
+    the encode.
+    """
+    return len(text) if text.isascii() else len(text.encode())
+
+
+class LoopMonitor:
+    """Samples event-loop lag and refreshes the rate gauges every ``interval`` seconds."""
+
+    def __init__(self, registry: Registry = REGISTRY, interval: float = 1.0) -> None:
+        self.registry = registry
+        self.interval = interval
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._handle: Optional[asyncio.TimerHandle] = None
+        self._expected = 0.0
+
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._schedule()
+
+    def stop(self) -> None:
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+    def _schedule(self) -> None:
+        self._expected = self._loop.time() + self.interval
+        self._handle = self._loop.call_at(self._expected, self._tick)
+
+    def _tick(self) -> None:
+        LOOP_LAG_SECONDS.observe(max(0.0, self._loop.time() - self._expected))
+        now = time.monotonic()
+        for rate in self.registry.rates():
+            rate.update(now)
+        self._schedule()
@@ -0,0 +1,154 @@
+"""Control messages on the /ps socket.
+
+Clients send JSON objects (codec dicts in binary mode) with an "action":
+
+    {"action": "subscribe", "topic": "sensors", "channel": 3, "id": 1}
+    {"action": "unsubscribe", "channel": 3, "id": 2}
+    {"action": "publish", "topic": "sensors", "data": {...}, "key": "s7"}
+    {"action": "pong"}
+
+A subscribe may also carry "since", "conflate", "filter" and "delta" (see
+server.delta); "resync" asks for the full state of a delta subscription
+again, e.g. after the client saw a patch whose base it does not hold. Given a
+"channel" (an unsigned 32-bit id picked by the client), every data frame of
+that subscription arrives prefixed with it, as ``3|{...}`` in text mode, so
+one socket can carry all of a page's widgets; the same topic may be
+subscribed on several channels. An unsubscribe names the channel, or the
+topic for a subscription made without one.
+
+A control message with an "id" is answered with ``{"event": "ack", "id": ...}``
+once applied. Rejected messages are answered with an "error" event, carrying
+the id if there was one.
+"""
+import json
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from .aggregate import DerivedTopics
+from .broker import Broker
+from .connection import Connection
+from .filters import FilterError, compile_filter
+from .frame import Frame
+
+MAX_CHANNEL = (1 << 32) - 1
+
+
+class ProtocolError(ValueError):
+    """Raised for control messages that cannot be applied."""
+
+
+def parse_control(text: str) -> Optional[Dict[str, Any]]:
+    # Control messages are JSON objects with an "action"; anything else
+    # is treated as plain chat text and echoed back.
+    if not text.startswith("{"):
+        return None
+    try:
+        message = json.loads(text)
+    except ValueError:
+        return None
+    return message if is_control(message) else None
+
+
+def is_control(message: Any) -> bool:
+    return isinstance(message, dict) and isinstance(message.get("action"), str)
+
+
+class Protocol:
+    """Applies control messages from /ps connections to the broker."""
+
+    def __init__(self, broker: Broker, derived: DerivedTopics) -> None:
+        self.broker = broker
+        self.derived = derived
+        self._handlers: Dict[str, Callable[[Connection, Dict[str, Any]], None]] = {
+            "subscribe": self._subscribe,
+            "unsubscribe": self._unsubscribe,
+            "publish": self._publish,
+            "resync": self._resync,
+            # Only refreshes last_seen, which the receive loop already did.
+            "pong": lambda connection, message: None,
+        }
+
+    def dispatch(self, connection: Connection, message: Dict[str, Any]) -> None:
+        action = message["action"]
+        request_id = message.get("id")
+        handler = self._handlers.get(action)
+        try:
+            if handler is None:
+                raise ProtocolError(f"Unknown action {action!r}")
+            handler(connection, message)
+        except (ProtocolError, FilterError) as e:
+            reply = {"event": "error", "action": action, "error": str(e)}
+            if isinstance(message.get("topic"), str):
+                reply["topic"] = message["topic"]
+            if message.get("channel") is not None:
+                reply["channel"] = message["channel"]
+            if request_id is not None:
+                reply["id"] = request_id
+            connection.enqueue(Frame.reply(reply))
+            return
+        if request_id is not None:
+            connection.enqueue(Frame.reply({"event": "ack", "id": request_id}))
+
+    def _subscribe(self, connection: Connection, message: Dict[str, Any]) -> None:
+        topic = _topic(message)
+        channel = _channel(message)
+        since = message.get("since")
+        if not isinstance(since, int):
+            since = None
+        predicate = None
+        if message.get("filter") is not None:
+            predicate = compile_filter(message["filter"])
+        self.derived.ensure(topic)
+        self.broker.subscribe(
+            topic,
+            connection,
+            since=since,
+            conflate=message.get("conflate") is True,
+            predicate=predicate,
+            channel=channel,
+            delta=message.get("delta") is True,
+        )
+
+    def _unsubscribe(self, connection: Connection, message: Dict[str, Any]) -> None:
+        channel = _channel(message)
+        self.broker.unsubscribe(_topic(message) if channel is None else channel, connection)
+
+    def _resync(self, connection: Connection, message: Dict[str, Any]) -> None:
+        channel = _channel(message)
+        key = _topic(message) if channel is None else channel
+        if not self.broker.resync(key, connection):
+            raise ProtocolError("No delta subscription to resync")
+
+    def _publish(self, connection: Connection, message: Dict[str, Any]) -> None:
+        if connection.binary:
+            # The codec can carry bytes, which text subscribers, delta
+            # patches and the worker bus could not encode.
+            try:
+                json.dumps(message.get("data"))
+            except (TypeError, ValueError) as e:
+                raise ProtocolError(f'"data" cannot be represented as JSON: {e}') from None
+        self.broker.publish(_topic(message), message.get("data"), _key(message))
+
+
+def _topic(message: Dict[str, Any]) -> str:
+    topic = message.get("topic")
+    if not isinstance(topic, str) or not topic:
+        raise ProtocolError('"topic" must be a non-empty string')
+    return topic
+
+
+def _key(message: Dict[str, Any]) -> Optional[Hashable]:
+    # Keys index conflation slots and delta state, so they must be hashable
+    # and compare the same after a round trip through JSON.
+    key = message.get("key")
+    if key is not None and type(key) not in (str, int, float, bool):
+        raise ProtocolError('"key" must be a string, number or boolean')
+    return key
+
+
+def _channel(message: Dict[str, Any]) -> Optional[int]:
+    channel = message.get("channel")
+    if channel is None:
+        return None
+    if type(channel) is not int or not 0 <= channel <= MAX_CHANNEL:
+        raise ProtocolError('"channel" must be an integer from 0 to 2**32-1')
+    return channel
@@ -0,0 +1,90 @@
+import time
+from enum import Enum
+from typing import Optional
+
+
+class TokenBucket:
+    """Allows ``rate`` units per second on average, in bursts of up to ``capacity``.
+
+    Tokens are refilled lazily from the elapsed time whenever the bucket is
+    consulted, so an idle bucket costs nothing.
+    """
+
+    __slots__ = ("rate", "capacity", "tokens", "stamp")
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.stamp = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def shortfall(self, amount: float = 1.0) -> float:
+        """Seconds until ``amount`` can be taken; 0.0 if it can be taken now.
+
+        An amount larger than the whole bucket only has to wait for a full
+        bucket, and then leaves it in debt.
+        """
+        self._refill()
+        missing = min(amount, self.capacity) - self.tokens
+        return missing / self.rate if missing > 0 else 0.0
+
+    def take(self, amount: float = 1.0) -> bool:
+        if self.shortfall(amount):
+            return False
+        self.tokens -= amount
+        return True
+
+
+class InboundAction(str, Enum):
+    """What happens to a message a client sends over its rate limit."""
+
+    DROP = "drop"
+    DELAY = "delay"
+    CLOSE = "close"
+
+
+class InboundLimiter:
+    """Message and byte budgets for everything one client sends.
+
+    A message is admitted only if both buckets can pay for it, so a rejected
+    message costs nothing from either.
+    """
+
+    __slots__ = ("messages", "bytes", "action")
+
+    def __init__(
+        self,
+        message_rate: float = 0.0,
+        message_burst: float = 0.0,
+        byte_rate: float = 0.0,
+        byte_burst: float = 0.0,
+        action: InboundAction = InboundAction.DELAY,
+    ) -> None:
+        self.messages: Optional[TokenBucket] = None
+        self.bytes: Optional[TokenBucket] = None
+        if message_rate > 0:
+            self.messages = TokenBucket(message_rate, max(message_burst, 1))
+        if byte_rate > 0:
+            self.bytes = TokenBucket(byte_rate, max(byte_burst, 1))
+        self.action = action
+
+    def acquire(self, size: int) -> float:
+        """Charge one message of ``size``; returns 0.0, or how long until it would fit."""
+        messages, data = self.messages, self.bytes
+        wait = 0.0
+        if messages is not None:
+            wait = messages.shortfall(1)
+        if data is not None:
+            wait = max(wait, data.shortfall(size))
+        if wait:
+            return wait
+        if messages is not None:
+            messages.tokens -= 1
+        if data is not None:
+            data.tokens -= size
+        return 0.0
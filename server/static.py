@@ -0,0 +1,115 @@
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+from typing import Dict, List, Mapping, Optional, Tuple
+
+from fastapi.responses import Response
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+log = logging.getLogger(__name__)
+
+# Compressing tiny files costs more in headers than it saves.
+MIN_COMPRESS_SIZE = 256
+
+
+class Asset:
+    """One file held in memory with its precompressed variants."""
+
+    __slots__ = ("content_type", "etags", "variants")
+
+    def __init__(self, body: bytes, content_type: str, cache_control: str) -> None:
+        self.content_type = content_type
+        digest = hashlib.blake2b(body, digest_size=16).hexdigest()
+        # encoding -> (body, headers); identity is always present.
+        self.variants: Dict[str, Tuple[bytes, Dict[str, str]]] = {}
+        self.etags: List[str] = []
+        encoded = {"identity": body}
+        if len(body) >= MIN_COMPRESS_SIZE:
+            encoded["gzip"] = gzip.compress(body, compresslevel=9, mtime=0)
+            if brotli is not None:
+                encoded["br"] = brotli.compress(body, quality=11)
+        for encoding, data in encoded.items():
+            if encoding != "identity" and len(data) >= len(body):
+                continue
+            etag = f'"{digest}"' if encoding == "identity" else f'"{digest}-{encoding}"'
+            headers = {
+                "ETag": etag,
+                "Cache-Control": cache_control,
+                "Vary": "Accept-Encoding",
+            }
+            if encoding != "identity":
+                headers["Content-Encoding"] = encoding
+            self.variants[encoding] = (data, headers)
+            self.etags.append(etag)
+
+    def response(self, request_headers: Mapping[str, str], cache_control: Optional[str] = None) -> Response:
+        encoding = self._negotiate(request_headers.get("accept-encoding", ""))
+        body, headers = self.variants[encoding]
+        if cache_control is not None:
+            headers = {**headers, "Cache-Control": cache_control}
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match and self._matches(if_none_match):
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, headers=headers, media_type=self.content_type)
+
+    def _negotiate(self, accept_encoding: str) -> str:
+        if len(self.variants) == 1 or not accept_encoding:
+            return "identity"
+        accepted = set()
+        for part in accept_encoding.split(","):
+            name, _, params = part.strip().partition(";")
+            if params.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+                continue
+            accepted.add(name.strip().lower())
+        for encoding in ("br", "gzip"):
+            if encoding in self.variants and (encoding in accepted or "*" in accepted):
+                return encoding
+        return "identity"
+
+    def _matches(self, if_none_match: str) -> bool:
+        if if_none_match.strip() == "*":
+            return True
+        for tag in if_none_match.split(","):
+            tag = tag.strip()
+            if tag.startswith("W/"):
+                tag = tag[2:]
+            if tag in self.etags:
+                return True
+        return False
+
+
+class StaticAssets:
+    """Every file under one directory, read and compressed once at startup.
+
+    Only files found in ``directory`` when ``load`` runs are served, so
+    nothing outside it (or added later) is reachable.
+    """
+
+    def __init__(self, directory: str, cache_control: str) -> None:
+        self.directory = os.path.realpath(directory)
+        self.cache_control = cache_control
+        self._assets: Dict[str, Asset] = {}
+
+    def load(self) -> None:
+        assets = {}
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                relative = os.path.relpath(path, self.directory).replace(os.sep, "/")
+                with open(path, "rb") as f:
+                    body = f.read()
+                content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+                if content_type.startswith("text/") or content_type.endswith(("javascript", "json")):
+                    content_type += "; charset=utf-8"
+                assets[relative] = Asset(body, content_type, self.cache_control)
+        self._assets = assets
+        log.info(f"Cached {len(assets)} static assets from {self.directory}")
+
+    def get(self, path: str) -> Optional[Asset]:
+        return self._assets.get(path)
@@ -0,0 +1,92 @@
+import asyncio
+from collections import deque
+from typing import AsyncIterator, Deque, Dict, List, Optional
+
+from . import metrics
+from .frame import Frame, batch_text
+from .subscription import Subscription
+from .timerwheel import TimerWheel
+
+KEEPALIVE = b": keepalive\n\n"
+
+
+class BufferedSubscriber:
+    """A broker subscriber for HTTP clients (SSE and long-poll).
+
+    It is registered with the broker exactly like a WebSocket ``Connection``
+    and receives the same frame objects, so every encoding is shared with
+    the /ps subscribers of the topic. When the buffer is full the oldest
+    frame is dropped.
+    """
+
+    def __init__(self, max_queue: int = 1024) -> None:
+        self.subscriptions: Dict[str, Subscription] = {}
+        self.closed = False
+        self.dropped = 0
+        self._frames: Deque[Frame] = deque()
+        self._max_queue = max_queue
+        self._ready = asyncio.Event()
+
+    def enqueue(self, frame: Frame, subscription: Optional[Subscription] = None) -> bool:
+        if self.closed:
+            return False
+        if len(self._frames) >= self._max_queue:
+            self._frames.popleft()
+            self.dropped += 1
+            metrics.DROPPED.inc()
+        self._frames.append(frame)
+        self._ready.set()
+        return True
+
+    def drain(self) -> List[Frame]:
+        frames = list(self._frames)
+        self._frames.clear()
+        self._ready.clear()
+        return frames
+
+    async def wait(self) -> None:
+        await self._ready.wait()
+
+
+class EventStream(BufferedSubscriber):
+    """Feeds one /sse response.
+
+    Keep-alive comments are driven by the shared timer wheel and only sent
+    when nothing else went out during the interval.
+    """
+
+    def __init__(self, wheel: TimerWheel, keepalive: float, max_queue: int = 1024) -> None:
+        super().__init__(max_queue)
+        self._wheel = wheel
+        self._keepalive = keepalive
+        self._active = False
+        self._keepalive_due = False
+
+    def start(self) -> None:
+        self._wheel.schedule(self._keepalive, self._on_keepalive)
+
+    def _on_keepalive(self) -> None:
+        if self.closed:
+            return
+        if not self._active:
+            self._keepalive_due = True
+            self._ready.set()
+        self._active = False
+        self._wheel.schedule(self._keepalive, self._on_keepalive)
+
+    async def events(self) -> AsyncIterator[bytes]:
+        while not self.closed:
+            await self.wait()
+            frames = self.drain()
+            if frames:
+                self._active = True
+                metrics.MESSAGES_OUT.inc(len(frames))
+                yield b"".join(frame.sse for frame in frames)
+            elif self._keepalive_due:
+                yield KEEPALIVE
+            self._keepalive_due = False
+
+
+def poll_body(frames: List[Frame], seq: Optional[int]) -> str:
+    """Long-poll response: the events as a JSON array and the seq to resume from."""
+    return f'{{"seq": {"null" if seq is None else seq}, "events": {batch_text(frames)}}}'
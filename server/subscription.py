@@ -0,0 +1,46 @@
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from .frame import Frame
+
+
+class Subscription:
+    """One connection's interest in one topic, with its delivery options.
+
+    A connection can hold several subscriptions to the same topic as long as
+    they are on different channels, e.g. two widgets with different filters.
+    """
+
+    __slots__ = ("connection", "topic", "channel", "conflate", "predicate", "synced")
+
+    def __init__(
+        self,
+        connection: Any,
+        topic: str,
+        channel: Optional[int] = None,
+        conflate: bool = False,
+        predicate: Optional[Callable[[Frame], bool]] = None,
+        delta: bool = False,
+    ) -> None:
+        self.connection = connection
+        self.topic = topic
+        # Multiplexing id chosen by the client; prefixed to every data frame.
+        self.channel = channel
+        # Keep only the newest pending frame per key instead of queueing
+        # every sample.
+        self.conflate = conflate
+        # Compiled filter; frames it rejects are never queued.
+        self.predicate = predicate
+        # For delta subscriptions: key -> seq of the last state sent for it.
+        self.synced: Optional[Dict[Hashable, int]] = {} if delta else None
+
+    @property
+    def delta(self) -> bool:
+        return self.synced is not None
+
+    @property
+    def key(self) -> Hashable:
+        """Where the subscription is filed in ``connection.subscriptions``."""
+        return self.topic if self.channel is None else self.channel
+
+    def accepts(self, frame: Frame) -> bool:
+        return self.predicate is None or self.predicate(frame)
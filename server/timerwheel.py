@@ -0,0 +1,96 @@
+import asyncio
+from typing import Any, Callable, List, Optional
+
+
+class Timer:
+    __slots__ = ("deadline", "callback", "args", "cancelled")
+
+    def __init__(self, deadline: int, callback: Callable[..., None], args: tuple) -> None:
+        self.deadline = deadline
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+
+class TimerWheel:
+    """Hierarchical timer wheel swept by a single periodic callback.
+
+    Deadlines are rounded up to whole ticks. Level 0 has one slot per tick;
+    each further level has slots spanning a full turn of the level below and
+    is cascaded down as the wheel turns. Scheduling and cancelling are O(1),
+    and thousands of connection timers cost one loop callback per tick.
+    """
+
+    def __init__(self, tick: float = 0.1, level_bits: tuple = (8, 6, 6)) -> None:
+        self.tick = tick
+        self._bits = level_bits
+        self._levels: List[List[List[Timer]]] = [[[] for _ in range(1 << b)] for b in level_bits]
+        self._current = 0
+        self._origin = 0.0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._handle: Optional[asyncio.TimerHandle] = None
+
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._origin = self._loop.time()
+        self._handle = self._loop.call_later(self.tick, self._sweep)
+
+    def stop(self) -> None:
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+    def schedule(self, delay: float, callback: Callable[..., Any], *args: Any) -> Timer:
+        ticks = max(1, -int(-delay // self.tick))
+        timer = Timer(self._current + ticks, callback, args)
+        self._insert(timer)
+        return timer
+
+    def _insert(self, timer: Timer) -> None:
+        delta = timer.deadline - self._current
+        shift = 0
+        last = len(self._bits) - 1
+        for level, bits in enumerate(self._bits):
+            if delta < (1 << (shift + bits)) or level == last:
+                slots = self._levels[level]
+                slots[(timer.deadline >> shift) & (len(slots) - 1)].append(timer)
+                return
+            shift += bits
+
+    def _sweep(self) -> None:
+        # Catch up on every tick that elapsed, in case the loop was busy.
+        target = int((self._loop.time() - self._origin) / self.tick)
+        while self._current < target:
+            self._advance()
+        self._handle = self._loop.call_at(
+            self._origin + (self._current + 1) * self.tick, self._sweep
+        )
+
+    def _advance(self) -> None:
+        self._current += 1
+        current = self._current
+        shift = 0
+        for level in range(1, len(self._bits)):
+            shift += self._bits[level - 1]
+            if current & ((1 << shift) - 1):
+                break
+            slots = self._levels[level]
+            index = (current >> shift) & (len(slots) - 1)
+            cascading, slots[index] = slots[index], []
+            for timer in cascading:
+                if not timer.cancelled:
+                    self._insert(timer)
+        slots = self._levels[0]
+        index = current & (len(slots) - 1)
+        due, slots[index] = slots[index], []
+        for timer in due:
+            if timer.cancelled:
+                continue
+            if timer.deadline > current:
+                # Parked at the top level beyond the wheel's span.
+                self._insert(timer)
+                continue
+            timer.callback(*timer.args)
@@ -0,0 +1,65 @@
+import time
+from typing import Dict, Hashable, List, Optional, Set, Tuple
+
+from .delta import make_patch
+from .frame import Frame
+from .subscription import Subscription
+
+
+class ReplayBuffer:
+    """The most recent frames of a topic, for clients catching up after a reconnect.
+
+    Slots are preallocated and indexed by sequence number, so appending never
+    allocates. With ``max_age`` set, frames older than that many seconds are
+    no longer replayed even if their slot has not been reused yet.
+    """
+
+    def __init__(self, capacity: int, max_age: Optional[float] = None) -> None:
+        self.capacity = capacity
+        self.max_age = max_age
+        self.last_seq = 0
+        self._frames: List[Optional[Frame]] = [None] * capacity
+        self._stamps: List[float] = [0.0] * capacity
+
+    def append(self, frame: Frame) -> None:
+        index = frame.seq % self.capacity
+        self._frames[index] = frame
+        self._stamps[index] = time.monotonic()
+        self.last_seq = frame.seq
+
+    def since(self, seq: int) -> Tuple[List[Frame], bool]:
+        """Frames after ``seq``, and whether that covers everything the client missed."""
+        first = max(1, self.last_seq - self.capacity + 1)
+        if self.max_age is not None:
+            cutoff = time.monotonic() - self.max_age
+            while first <= self.last_seq and self._stamps[first % self.capacity] < cutoff:
+                first += 1
+        start = max(seq + 1, first)
+        frames = [self._frames[s % self.capacity] for s in range(start, self.last_seq + 1)]
+        return frames, seq + 1 >= first
+
+
+class Topic:
+    """Subscribers, sequence counter and replay history of one topic."""
+
+    __slots__ = ("name", "subscribers", "seq", "history", "states", "deltas")
+
+    def __init__(self, name: str, history: Optional[ReplayBuffer] = None) -> None:
+        self.name = name
+        self.subscribers: Set[Subscription] = set()
+        self.seq = 0
+        self.history = history
+        # Latest frame per key, kept only while a subscriber uses delta.
+        self.states: Optional[Dict[Hashable, Frame]] = None
+        self.deltas = 0
+
+    def stamp(self, frame: Frame) -> None:
+        self.seq += 1
+        frame.seq = self.seq
+        if self.states is not None:
+            previous = self.states.get(frame.key)
+            if previous is not None:
+                frame.patch = make_patch(previous, frame)
+            self.states[frame.key] = frame
+        if self.history is not None:
+            self.history.append(frame)